@@ -39,9 +39,17 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     # Project apps
     'project.sample',
+    'project.backfill',
+    'project.metrics',
+    'project.outbox',
+    'project.sharding',
+    'project.loadtest',
+    'project.profiling',
 ]
 
 MIDDLEWARE = [
+    'project.metrics.middleware.MetricsMiddleware',
+    'project.profiling.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,20 +61,42 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'config.urls'
 
-TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR / 'web'],
-        'APP_DIRS': True,
-        'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
-        },
+# Engine for the web/ pages: 'django', or 'jinja2' to render them from
+# web/jinja2/ (requires Jinja2). The admin always uses the Django engine.
+WEB_TEMPLATE_ENGINE = 'django'
+
+DJANGO_TEMPLATES = {
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'DIRS': [BASE_DIR / 'web'],
+    'APP_DIRS': True,
+    'OPTIONS': {
+        'context_processors': [
+            'django.template.context_processors.request',
+            'django.contrib.auth.context_processors.auth',
+            'django.contrib.messages.context_processors.messages',
+        ],
     },
-]
+}
+
+JINJA2_TEMPLATES = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [BASE_DIR / 'web' / 'jinja2'],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        'environment': 'web.templating.environment',
+        'context_processors': [
+            'django.contrib.auth.context_processors.auth',
+            'django.contrib.messages.context_processors.messages',
+        ],
+    },
+}
+
+# Directory for compiled Jinja2 bytecode shared by all workers.
+JINJA2_BYTECODE_CACHE_DIR = BASE_DIR / '.jinja2_cache'
+
+TEMPLATES = [DJANGO_TEMPLATES]
+if WEB_TEMPLATE_ENGINE == 'jinja2':
+    TEMPLATES.insert(0, JINJA2_TEMPLATES)
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
@@ -81,6 +111,23 @@ DATABASES = {
     }
 }
 
+DATABASE_ROUTERS = ['project.sharding.routers.ShardRouter']
+
+# Aliases that hold Person rows, placed by a hash of the email modulo the
+# number of shards. Leave empty to keep everything on 'default'. The list is
+# fixed once data has been written: adding, removing or reordering aliases
+# moves emails to other shards and breaks the shard encoded in every pk.
+# Turn sharding on before any Person is written; the first sharded write
+# refuses to run over rows written without it.
+PERSON_SHARDS = []
+
+# Each shard other than 'default' is a SQLite file of its own.
+for _shard in PERSON_SHARDS:
+    DATABASES.setdefault(_shard, {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_{_shard}.sqlite3',
+    })
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,3 +169,45 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Metrics
+# Each worker thread writes its own memory-mapped file here; /metrics sums them.
+
+METRICS_DIR = BASE_DIR / '.metrics'
+
+
+# Profiling
+# On-demand stack sampling and allocation reports, switched on at /profiling/.
+# Set PROFILING_ENABLED = False to remove the middleware entirely.
+
+PROFILING_ENABLED = True
+PROFILING_DIR = BASE_DIR / '.profiles'
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The 'person' cache must be shared by every worker process: the file cache
+# covers one host, use Redis or Memcached across hosts. It counts its files
+# on one write in CULL_EVERY instead of listing the directory on every write.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'person': {
+        'BACKEND': 'project.sample.cache_backends.SampledCullFileCache',
+        'LOCATION': BASE_DIR / '.person_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'CULL_EVERY': 100},
+    },
+}
+
+
+# Person cache
+# Two tiers in front of the database for Person lookups by pk: a per-process
+# LRU of PERSON_CACHE_LOCAL_SIZE rows and the PERSON_CACHE_ALIAS cache backend.
+# A process-local backend (LocMemCache, DummyCache) turns the cache off.
+
+PERSON_CACHE_ALIAS = 'person'
+PERSON_CACHE_LOCAL_SIZE = 1000
+PERSON_CACHE_TIMEOUT = 60 * 60
@@ -0,0 +1,25 @@
+"""
+Settings for the test suite and benchmarks
+
+Adds three spare shard databases, so tests and the sharded_writes benchmark
+can switch sharding on with override_settings(PERSON_SHARDS=...). Their test
+databases are files in the temporary directory, so concurrent writer
+processes really contend per file.
+"""
+import tempfile
+from pathlib import Path
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+DATABASES = {
+    **DATABASES,
+    **{
+        shard: {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / f'db_{shard}.sqlite3',
+            'TEST': {'NAME': Path(tempfile.gettempdir()) / f'test_db_{shard}.sqlite3'},
+        }
+        for shard in ('shard1', 'shard2', 'shard3')
+    },
+}
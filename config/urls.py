@@ -21,4 +21,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('web.public.urls')),
     path('sample/', include('web.sample.urls')),
+    path('', include('web.metrics.urls')),
+    path('outbox/', include('web.outbox.urls')),
+    path('profiling/', include('web.profiling.urls')),
 ]
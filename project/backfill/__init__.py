@@ -0,0 +1,14 @@
+"""
+Backfill app
+
+Online data migrations for large tables:
+- Backfill base class applied in keyset-paginated pk batches
+- Checkpoint table so interrupted runs resume where they stopped
+- Adaptive batch sizing and throttling from measured batch latency
+- ``backfill`` management command with progress and ETA reporting
+
+Apps declare backfills in a ``backfills.py`` module, which is discovered
+automatically at startup.
+"""
+
+default_app_config = 'project.backfill.apps.BackfillConfig'
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import BackfillCheckpoint
+
+# Register your models here.
+
+@admin.register(BackfillCheckpoint)
+class BackfillCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['name', 'last_pk', 'rows_processed', 'batches', 'updated_at', 'completed_at']
+    search_fields = ['name']
+    readonly_fields = ['started_at', 'updated_at']
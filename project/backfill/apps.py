@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class BackfillConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'project.backfill'
+
+    def ready(self):
+        autodiscover_modules('backfills')
@@ -0,0 +1,188 @@
+"""
+Backfill base class, registry and runner
+"""
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import BackfillCheckpoint
+
+registry = {}
+
+
+def register(backfill_class):
+    """Class decorator that makes a backfill available to the ``backfill`` command"""
+    name = backfill_class.name
+    if not name:
+        raise ImproperlyConfigured(f'{backfill_class.__name__} must define a name.')
+    if registry.get(name, backfill_class) is not backfill_class:
+        raise ImproperlyConfigured(f'A backfill named "{name}" is already registered.')
+    registry[name] = backfill_class
+    return backfill_class
+
+
+class Backfill:
+    """
+    Base class for online data migrations.
+
+    Subclasses set ``name`` (the checkpoint key, so keep it stable) and
+    ``model``, and implement ``process_batch()``. Batches are contiguous pk
+    ranges committed one transaction at a time together with the checkpoint.
+    """
+    name = None
+    model = None
+
+    batch_size = 1000
+    min_batch_size = 10
+    max_batch_size = 10000
+    # Batches slower than this shrink, batches under half of it grow.
+    target_batch_seconds = 0.2
+    # Sleep this multiple of the last batch latency so writers get the table back.
+    sleep_ratio = 1.0
+
+    def __init__(self, **options):
+        for key, value in options.items():
+            if value is None:
+                continue
+            if not hasattr(type(self), key):
+                raise TypeError(f'{type(self).__name__} has no option "{key}"')
+            setattr(self, key, value)
+
+    def get_queryset(self):
+        """Rows eligible for the backfill"""
+        return self.model._default_manager.all()
+
+    def process_batch(self, queryset):
+        """Apply the change to one batch and return the number of rows changed"""
+        raise NotImplementedError('Backfill subclasses must implement process_batch()')
+
+    def next_batch_size(self, batch_size, latency):
+        """Scale the batch size towards target_batch_seconds"""
+        if latency > self.target_batch_seconds:
+            batch_size = int(batch_size * self.target_batch_seconds / latency)
+        elif latency < self.target_batch_seconds / 2:
+            batch_size *= 2
+        return max(self.min_batch_size, min(self.max_batch_size, batch_size))
+
+    def pause_after(self, latency):
+        """Seconds to sleep after a batch that took `latency` seconds"""
+        return latency * self.sleep_ratio
+
+
+class BatchReport:
+    """Progress snapshot handed to the runner's on_batch callback"""
+
+    def __init__(self, checkpoint, batch_rows, changed, latency, pause, scanned, remaining, elapsed):
+        self.checkpoint = checkpoint
+        self.batch_rows = batch_rows
+        self.changed = changed
+        self.latency = latency
+        self.pause = pause
+        self.scanned = scanned
+        self.remaining = remaining
+        self.elapsed = elapsed
+
+    @property
+    def rate(self):
+        """Rows scanned per second of wall time in this run"""
+        return self.scanned / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Estimated seconds until the backfill completes, or None if unknown"""
+        left = max(self.remaining - self.scanned, 0)
+        if not left:
+            return 0.0
+        return left / self.rate if self.rate else None
+
+
+class BackfillRunner:
+    """Walks a backfill's queryset in pk batches, checkpointing after each one"""
+
+    def __init__(self, backfill, on_batch=None, sleep=time.sleep, clock=time.monotonic, using=None):
+        self.backfill = backfill
+        self.on_batch = on_batch
+        self.sleep = sleep
+        self.clock = clock
+        # Sharded tables are walked one database at a time, each with its own checkpoint.
+        self.using = using or router.db_for_write(backfill.model)
+
+    def get_checkpoint(self, restart=False):
+        checkpoint, created = BackfillCheckpoint.objects.using(self.using).get_or_create(
+            name=self.backfill.name
+        )
+        if restart and not created:
+            checkpoint.last_pk = None
+            checkpoint.rows_processed = 0
+            checkpoint.batches = 0
+            checkpoint.completed_at = None
+            checkpoint.started_at = timezone.now()
+            checkpoint.save(using=self.using)
+        return checkpoint
+
+    def run(self, max_batches=None, restart=False):
+        """Process batches until done or `max_batches` have run; return the checkpoint"""
+        backfill = self.backfill
+        checkpoint = self.get_checkpoint(restart=restart)
+        if checkpoint.is_complete:
+            return checkpoint
+
+        queryset = backfill.get_queryset().using(self.using).order_by()
+        # Rows created after this point are the application's responsibility.
+        high_pk = queryset.aggregate(high=Max('pk'))['high']
+        remaining = self._pending(queryset, checkpoint.last_pk, high_pk).count()
+
+        batch_size = backfill.batch_size
+        scanned = 0
+        batches_run = 0
+        started = self.clock()
+        while max_batches is None or batches_run < max_batches:
+            pending = self._pending(queryset, checkpoint.last_pk, high_pk)
+            boundary = list(
+                pending.order_by('pk').values_list('pk', flat=True)[batch_size - 1:batch_size]
+            )
+            if boundary:
+                end_pk, batch_rows = boundary[0], batch_size
+            elif high_pk is not None and (checkpoint.last_pk is None or checkpoint.last_pk < high_pk):
+                end_pk, batch_rows = high_pk, max(remaining - scanned, 0)
+            else:
+                checkpoint.completed_at = timezone.now()
+                checkpoint.save(using=self.using)
+                break
+
+            batch_started = self.clock()
+            with transaction.atomic(using=self.using):
+                changed = backfill.process_batch(pending.filter(pk__lte=end_pk)) or 0
+                checkpoint.last_pk = end_pk
+                checkpoint.rows_processed += changed
+                checkpoint.batches += 1
+                if end_pk >= high_pk:
+                    checkpoint.completed_at = timezone.now()
+                checkpoint.save(using=self.using)
+            latency = self.clock() - batch_started
+
+            scanned += batch_rows
+            batches_run += 1
+            batch_size = backfill.next_batch_size(batch_size, latency)
+            pause = backfill.pause_after(latency)
+            if self.on_batch:
+                self.on_batch(BatchReport(
+                    checkpoint, batch_rows, changed, latency, pause,
+                    scanned, remaining, self.clock() - started,
+                ))
+            if checkpoint.is_complete:
+                break
+            if pause:
+                self.sleep(pause)
+        return checkpoint
+
+    @staticmethod
+    def _pending(queryset, last_pk, high_pk):
+        if high_pk is None:
+            return queryset.none()
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        return queryset.filter(pk__lte=high_pk)
@@ -0,0 +1,126 @@
+"""
+Management command to run a registered backfill in throttled batches
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from project.backfill.base import BackfillRunner, registry
+from project.backfill.models import BackfillCheckpoint
+from project.sharding.shards import scatter
+
+
+class Command(BaseCommand):
+    help = 'Run a registered backfill in resumable, throttled pk batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'name',
+            nargs='?',
+            help='Name of the backfill to run',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List registered backfills and their progress',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Initial batch size (default: the backfill\'s own)',
+        )
+        parser.add_argument(
+            '--target-seconds',
+            type=float,
+            help='Batch latency the adaptive sizing aims for',
+        )
+        parser.add_argument(
+            '--sleep-ratio',
+            type=float,
+            help='Sleep this multiple of each batch\'s latency between batches',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            help='Stop after this many batches per database (the run can be resumed later)',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Discard the checkpoint and start from the lowest pk',
+        )
+        parser.add_argument(
+            '--database',
+            help='Database to run against, e.g. one Person shard (default: every shard in turn)',
+        )
+        parser.add_argument(
+            '--report-every',
+            type=float,
+            default=5.0,
+            help='Seconds between progress lines (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            self.list_backfills(options['database'])
+            return
+
+        name = options['name']
+        if not name:
+            raise CommandError('Give a backfill name, or use --list to see them.')
+        if name not in registry:
+            raise CommandError(f'Unknown backfill "{name}". Use --list to see them.')
+
+        backfill = registry[name](
+            batch_size=options['batch_size'],
+            target_batch_seconds=options['target_seconds'],
+            sleep_ratio=options['sleep_ratio'],
+        )
+        self.report_every = options['report_every']
+        databases = self.databases(backfill.model, options['database'])
+        for using in databases:
+            # Each shard has its own rows and its own checkpoint.
+            self.last_report = None
+            runner = BackfillRunner(backfill, on_batch=self.report, using=using)
+            checkpoint = runner.run(max_batches=options['max_batches'], restart=options['restart'])
+            label = f'{name} on {runner.using}' if len(databases) > 1 else name
+            if checkpoint.is_complete:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{label}: complete, {checkpoint.rows_processed} rows changed '
+                    f'in {checkpoint.batches} batches'
+                ))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f'{label}: stopped at pk {checkpoint.last_pk}; run again to resume'
+                ))
+
+    @staticmethod
+    def databases(model, using=None):
+        """The given database, or every database holding `model` rows"""
+        if using:
+            return [using]
+        return [part.db for part in scatter(model._default_manager.all())]
+
+    def report(self, batch):
+        if self.last_report is not None and batch.elapsed - self.last_report < self.report_every:
+            return
+        self.last_report = batch.elapsed
+        eta = 'unknown' if batch.eta is None else f'{batch.eta:.0f}s'
+        self.stdout.write(
+            f'pk <= {batch.checkpoint.last_pk}: {batch.scanned}/{batch.remaining} rows, '
+            f'{batch.rate:.0f} rows/s, batch {batch.batch_rows} in {batch.latency * 1000:.0f} ms, '
+            f'ETA {eta}'
+        )
+
+    def list_backfills(self, using=None):
+        for name, backfill_class in sorted(registry.items()):
+            databases = self.databases(backfill_class.model, using)
+            states = []
+            for database in databases:
+                checkpoint = BackfillCheckpoint.objects.using(database).filter(name=name).first()
+                if checkpoint is None:
+                    state = 'not started'
+                elif checkpoint.is_complete:
+                    state = f'complete ({checkpoint.rows_processed} rows changed)'
+                else:
+                    state = f'in progress at pk {checkpoint.last_pk}'
+                states.append(f'{database} {state}' if len(databases) > 1 else state)
+            self.stdout.write(f'{name}: {", ".join(states)} - {(backfill_class.__doc__ or "").strip()}')
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('last_pk', models.BigIntegerField(blank=True, null=True)),
+                ('rows_processed', models.BigIntegerField(default=0)),
+                ('batches', models.IntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Backfill checkpoint',
+                'verbose_name_plural': 'Backfill checkpoints',
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import models
+
+# Create your models here.
+
+class BackfillCheckpoint(models.Model):
+    """Progress of a backfill, committed together with each batch"""
+    name = models.CharField(max_length=200, unique=True)
+    last_pk = models.BigIntegerField(null=True, blank=True)
+    rows_processed = models.BigIntegerField(default=0)
+    batches = models.IntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Backfill checkpoint"
+        verbose_name_plural = "Backfill checkpoints"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def is_complete(self):
+        return self.completed_at is not None
@@ -0,0 +1,126 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models.functions import Upper
+from django.test import TestCase
+from project.sample.backfills import NormalizePersonNames
+from project.sample.models import Person
+from .base import Backfill, BackfillRunner
+from .models import BackfillCheckpoint
+
+
+class SimulatedCrash(Exception):
+    pass
+
+
+class UppercaseLastNames(Backfill):
+    """Test backfill that records every pk it touches"""
+    name = 'test.uppercase_last_names'
+    model = Person
+    batch_size = 3
+    min_batch_size = 1
+    max_batch_size = 3
+    sleep_ratio = 0
+    fail_on_batch = None
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.seen = []
+
+    def process_batch(self, queryset):
+        pks = list(queryset.values_list('pk', flat=True))
+        changed = queryset.update(last_name=Upper('last_name'))
+        if len(self.seen) + 1 == self.fail_on_batch:
+            raise SimulatedCrash()
+        self.seen.append(pks)
+        return changed
+
+
+class BackfillRunnerTest(TestCase):
+    """Test cases for the backfill runner"""
+
+    def setUp(self):
+        """Set up test data"""
+        Person.objects.bulk_create([
+            Person(first_name=f'  First{i}', last_name=f'last{i} ', email=f'p{i}@example.com')
+            for i in range(10)
+        ])
+        self.pks = list(Person.objects.order_by('pk').values_list('pk', flat=True))
+
+    def test_sample_backfill_normalizes_names(self):
+        """Test that the sample backfill trims every name"""
+        backfill = NormalizePersonNames(batch_size=4, min_batch_size=4, max_batch_size=4)
+        checkpoint = BackfillRunner(backfill, sleep=lambda seconds: None).run()
+        self.assertTrue(checkpoint.is_complete)
+        self.assertEqual(checkpoint.rows_processed, 10)
+        self.assertEqual(checkpoint.batches, 3)
+        self.assertFalse(Person.objects.filter(first_name__startswith=' ').exists())
+        self.assertEqual(Person.objects.get(email='p3@example.com').full_name, 'First3 last3')
+
+    def test_resume_after_crash(self):
+        """Test that a crashed batch rolls back and the rerun processes each row once"""
+        crashing = UppercaseLastNames(fail_on_batch=3)
+        with self.assertRaises(SimulatedCrash):
+            BackfillRunner(crashing).run()
+
+        checkpoint = BackfillCheckpoint.objects.get(name=crashing.name)
+        self.assertEqual(checkpoint.last_pk, self.pks[5])
+        self.assertFalse(checkpoint.is_complete)
+        self.assertEqual(Person.objects.filter(last_name=Upper('last_name')).count(), 6)
+
+        resumed = UppercaseLastNames()
+        checkpoint = BackfillRunner(resumed).run()
+        self.assertTrue(checkpoint.is_complete)
+        processed = [pk for batch in crashing.seen + resumed.seen for pk in batch]
+        self.assertEqual(processed, self.pks)
+        self.assertEqual(Person.objects.filter(last_name=Upper('last_name')).count(), 10)
+
+    def test_max_batches_then_resume(self):
+        """Test stopping after a number of batches and continuing later"""
+        first = UppercaseLastNames()
+        checkpoint = BackfillRunner(first).run(max_batches=2)
+        self.assertEqual(checkpoint.last_pk, self.pks[5])
+        self.assertFalse(checkpoint.is_complete)
+
+        BackfillRunner(UppercaseLastNames()).run()
+        checkpoint.refresh_from_db()
+        self.assertTrue(checkpoint.is_complete)
+        self.assertEqual(checkpoint.rows_processed, 10)
+
+    def test_restart_discards_checkpoint(self):
+        """Test that restart starts over from the lowest pk"""
+        BackfillRunner(UppercaseLastNames()).run()
+        again = UppercaseLastNames()
+        BackfillRunner(again).run(restart=True)
+        self.assertEqual(again.seen[0][0], self.pks[0])
+
+    def test_adaptive_batch_size_and_throttle(self):
+        """Test that batch size follows latency and the runner sleeps proportionally"""
+        ticks = iter(range(1000))
+        pauses = []
+        backfill = UppercaseLastNames(
+            batch_size=2, max_batch_size=4, target_batch_seconds=5, sleep_ratio=2
+        )
+        reports = []
+        BackfillRunner(
+            backfill,
+            on_batch=reports.append,
+            sleep=pauses.append,
+            clock=lambda: next(ticks),
+        ).run()
+        # Every batch takes one 1s tick, well under half the target, so sizes double.
+        self.assertEqual([len(batch) for batch in backfill.seen], [2, 4, 4])
+        self.assertEqual(pauses, [2, 2])
+        self.assertEqual(reports[-1].scanned, 10)
+        self.assertEqual(reports[-1].eta, 0.0)
+        self.assertEqual(backfill.next_batch_size(4, 10), 2)
+
+    def test_backfill_command(self):
+        """Test running and listing backfills through the management command"""
+        out = StringIO()
+        call_command('backfill', NormalizePersonNames.name, '--sleep-ratio', '0', stdout=out)
+        self.assertIn('complete, 10 rows changed', out.getvalue())
+
+        out = StringIO()
+        call_command('backfill', '--list', stdout=out)
+        self.assertIn(f'{NormalizePersonNames.name}: complete', out.getvalue())
@@ -0,0 +1,14 @@
+"""
+Load test app
+
+Drives real HTTP traffic at the site from ``python manage.py loadtest``:
+- A weighted scenario over the public and sample pages, including CSRF-protected form posts
+- Replay of an access log in Common or Combined Log Format, at its original pace or scaled
+- Open-loop arrivals, so a slow server builds a queue instead of slowing the load down
+- Latency percentiles from an HDR-style histogram, throughput and error rates as JSON
+
+Requests go through an asyncio HTTP/1.1 client with keep-alive connections,
+against a locally started WSGI (or, with uvicorn, ASGI) server or any URL.
+"""
+
+default_app_config = 'project.loadtest.apps.LoadtestConfig'
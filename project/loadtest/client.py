@@ -0,0 +1,129 @@
+"""
+Minimal asyncio HTTP/1.1 client for load generation
+
+One ``Connection`` is one keep-alive socket with its own cookie jar, like a
+browser tab. It speaks just enough HTTP/1.1 for this site: Content-Length,
+chunked and read-until-close bodies, and a single transparent reconnect
+when the server has dropped an idle keep-alive connection.
+"""
+import asyncio
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+
+class Response:
+    """Status, headers (lower-cased names) and body of one HTTP response"""
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', 'replace')
+
+
+class Connection:
+    """A keep-alive HTTP/1.1 connection to one server"""
+
+    def __init__(self, base_url, timeout=30.0):
+        url = urlsplit(base_url)
+        if url.scheme != 'http':
+            raise ValueError(f'Only http:// URLs are supported, not {base_url}')
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.host_header = url.netloc
+        self.timeout = timeout
+        self.cookies = {}
+        self.requests = 0
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b'', headers=None):
+        reused = self.writer is not None
+        try:
+            return await asyncio.wait_for(self._request(method, path, body, headers), self.timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            if not reused:
+                raise
+        # The server closed an idle keep-alive connection; retry once on a fresh one.
+        return await asyncio.wait_for(self._request(method, path, body, headers), self.timeout)
+
+    async def get(self, path):
+        return await self.request('GET', path)
+
+    async def post(self, path, data, headers=None):
+        body = urlencode(data).encode('ascii')
+        headers = {'Content-Type': 'application/x-www-form-urlencoded', **(headers or {})}
+        return await self.request('POST', path, body, headers)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.reader = self.writer = None
+
+    async def _request(self, method, path, body, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host_header}', 'User-Agent: django-template-loadtest']
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in self.cookies.items()))
+        for name, value in (headers or {}).items():
+            lines.append(f'{name}: {value}')
+        if body or method == 'POST':
+            lines.append(f'Content-Length: {len(body)}')
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+        self.requests += 1
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed before a response')
+        version, status = status_line.decode('latin-1').split(None, 2)[:2]
+        response_headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                self._store_cookie(value)
+            response_headers[name] = value
+
+        response_body = await self._read_body(method, int(status), response_headers)
+        if version == 'HTTP/1.0' or response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return Response(int(status), response_headers, response_body)
+
+    async def _read_body(self, method, status, headers):
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            return b''
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while size := int((await self.reader.readline()).split(b';')[0], 16):
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            while await self.reader.readline() not in (b'\r\n', b'\n', b''):
+                pass  # trailers
+            return b''.join(chunks)
+        if 'content-length' in headers:
+            return await self.reader.readexactly(int(headers['content-length']))
+        body = await self.reader.read()
+        await self.close()
+        return body
+
+    def _store_cookie(self, header):
+        cookie = SimpleCookie()
+        cookie.load(header)
+        for name, morsel in cookie.items():
+            if morsel['max-age'] == '0' or morsel.value == '':
+                self.cookies.pop(name, None)
+            else:
+                self.cookies[name] = morsel.value
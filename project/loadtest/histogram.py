@@ -0,0 +1,77 @@
+"""
+HDR-style latency histogram
+
+Values are integers (microseconds here). Values below ``2 ** bits`` get
+their own bucket; above that, each power of two is split into ``2 ** (bits - 1)``
+linear sub-buckets, so every recorded value is kept to within
+``10 ** -significant_figures`` relative error at a fixed, small memory cost,
+however long the tail.
+"""
+import math
+
+
+class Histogram:
+    """Counts of integer values in log-linear buckets"""
+
+    def __init__(self, significant_figures=3):
+        self.bits = math.ceil(math.log2(2 * 10 ** significant_figures))
+        self.half = 1 << (self.bits - 1)
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        shift = value.bit_length() - self.bits
+        if shift <= 0:
+            return value
+        return (1 << self.bits) + (shift - 1) * self.half + (value >> shift) - self.half
+
+    def _highest_equivalent(self, index):
+        if index < 1 << self.bits:
+            return index
+        shift, sub = divmod(index - (1 << self.bits), self.half)
+        return ((sub + self.half + 1) << (shift + 1)) - 1
+
+    def record(self, value):
+        value = max(int(value), 0)
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent):
+        """Smallest bucket bound covering `percent` of the values, capped at the true max"""
+        if not self.count:
+            return 0
+        target = max(math.ceil(self.count * percent / 100), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def summary(self, scale=1000, percentiles=(50, 75, 90, 99, 99.9)):
+        """Min, mean, percentiles and max, divided by `scale` (microseconds to ms by default)"""
+        summary = {
+            'min': (self.min or 0) / scale,
+            'mean': self.total / self.count / scale if self.count else 0,
+        }
+        for percent in percentiles:
+            summary[f'p{percent:g}'] = self.percentile(percent) / scale
+        summary['max'] = (self.max or 0) / scale
+        return summary
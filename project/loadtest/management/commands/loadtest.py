@@ -0,0 +1,195 @@
+"""
+Management command to load test the site and report latency as JSON
+"""
+import asyncio
+import json
+import sys
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import setup_databases, teardown_databases
+
+from project.loadtest.client import Connection
+from project.loadtest.runner import LoadRunner
+from project.loadtest.scenarios import DEFAULT_WEIGHTS, AccessLog, Scenario
+from project.loadtest.servers import SERVERS
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a weighted scenario over the site, or replay an access log, and '
+        'print throughput, latency percentiles and error rates as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--replay',
+            metavar='LOG',
+            help='Replay GET/HEAD requests from this Common/Combined Log Format file ("-" for stdin)',
+        )
+        parser.add_argument(
+            '--speed',
+            type=float,
+            default=1.0,
+            help='Replay this many times faster than the log was recorded (default: 1)',
+        )
+        parser.add_argument(
+            '--weight',
+            action='append',
+            default=[],
+            metavar='ACTION=N',
+            help=f'Scenario weight override; actions: {", ".join(DEFAULT_WEIGHTS)}',
+        )
+        parser.add_argument(
+            '--url',
+            help='Load an already running server at this base URL instead of starting one',
+        )
+        parser.add_argument(
+            '--server',
+            choices=sorted(SERVERS),
+            default='wsgi',
+            help='Local server to start when no --url is given (default: wsgi; asgi needs uvicorn)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=10,
+            help='Keep-alive connections sending requests (default: 10)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            help='Open-loop scenario arrivals per second (default: closed loop, as fast as answered)',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            help='Seconds to generate load for (default: 10 for the scenario, the whole log for --replay)',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            help='Stop after this many arrivals',
+        )
+        parser.add_argument(
+            '--seed-people',
+            type=int,
+            default=20,
+            help='People created before the scenario starts, untimed (default: 20)',
+        )
+        parser.add_argument(
+            '--random-seed',
+            type=int,
+            help='Seed for the scenario mix and arrival times, for repeatable runs',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30.0,
+            help='Seconds before a single HTTP request counts as an error (default: 30)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the JSON report to this file instead of stdout',
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1.')
+        with ExitStack() as stack:
+            source = self.get_source(options, stack)
+            base_url = options['url']
+            if base_url is None:
+                stack.enter_context(self.throwaway_databases())
+                try:
+                    base_url = stack.enter_context(SERVERS[options['server']]())
+                except ImportError as error:
+                    raise CommandError(f'The {options["server"]} server needs {error.name}: pip install {error.name}')
+            results = asyncio.run(self.drive(base_url, source, options))
+
+        report = {
+            'mode': 'replay' if options['replay'] else 'scenario',
+            'target': options['url'] or options['server'],
+            'concurrency': options['concurrency'],
+            'rate': options['rate'],
+            'duration_s': options['duration'],
+            **results.as_dict(),
+        }
+        if isinstance(source, AccessLog):
+            report['skipped_log_lines'] = source.skipped + source.unparsed
+        else:
+            report['weights'] = source.weights
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def get_source(self, options, stack):
+        if options['replay']:
+            if options['weight']:
+                raise CommandError('--weight applies to the scenario, not to --replay.')
+            if options['speed'] <= 0:
+                raise CommandError('--speed must be positive.')
+            if options['replay'] == '-':
+                stream = sys.stdin
+            else:
+                try:
+                    stream = stack.enter_context(open(options['replay']))
+                except OSError as error:
+                    raise CommandError(f'Cannot read {options["replay"]}: {error.strerror}')
+            return AccessLog(stream, speed=options['speed'])
+
+        weights = {}
+        for item in options['weight']:
+            name, _, weight = item.partition('=')
+            try:
+                weights[name] = int(weight)
+            except ValueError:
+                raise CommandError(f'Invalid --weight {item!r}; use ACTION=N.')
+        try:
+            return Scenario(weights, seed=options['random_seed'])
+        except ValueError as error:
+            raise CommandError(error)
+
+    async def drive(self, base_url, source, options):
+        if isinstance(source, Scenario) and options['seed_people']:
+            connection = Connection(base_url, options['timeout'])
+            try:
+                await source.seed(connection, options['seed_people'])
+            except Exception as error:
+                raise CommandError(f'Could not seed people at {base_url}: {error}')
+            finally:
+                await connection.close()
+
+        duration = options['duration']
+        if duration is None and isinstance(source, Scenario) and options['requests'] is None:
+            duration = 10.0
+        runner = LoadRunner(
+            base_url,
+            concurrency=options['concurrency'],
+            duration=duration,
+            max_requests=options['requests'],
+            timeout=options['timeout'],
+            open_loop=bool(options['rate']) or isinstance(source, AccessLog),
+        )
+        return await runner.run(source.schedule(options['rate']))
+
+    def throwaway_databases(self):
+        """Test databases for the local server; SQLite ones as files its threads can share"""
+        tmp = tempfile.TemporaryDirectory()
+        for alias in connections:
+            settings_dict = connections[alias].settings_dict
+            if connections[alias].vendor == 'sqlite' and not settings_dict['TEST'].get('NAME'):
+                settings_dict['TEST']['NAME'] = str(Path(tmp.name) / f'loadtest_{alias}.sqlite3')
+
+        stack = ExitStack()
+        stack.enter_context(tmp)
+        old_config = setup_databases(verbosity=0, interactive=False)
+        stack.callback(teardown_databases, old_config, verbosity=0)
+        return stack
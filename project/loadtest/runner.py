@@ -0,0 +1,152 @@
+"""
+Open-loop load runner
+
+Arrivals are queued at their scheduled time whether or not earlier
+requests have finished, and latency is measured from that scheduled time.
+A server that falls behind therefore shows its queueing delay in the
+percentiles instead of quietly lowering the offered load (coordinated
+omission). Service time, measured from when a connection picked the
+request up, is reported alongside.
+"""
+import asyncio
+from collections import Counter
+
+from .client import Connection
+from .histogram import Histogram
+
+
+class ActionStats:
+    """Counts and latencies for one action or route name"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.latency = Histogram()
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'error_rate': self.errors / self.count if self.count else 0.0,
+            'latency_ms': self.latency.summary(),
+        }
+
+
+class Results:
+    """Everything measured during one run"""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.service_time = Histogram()
+        self.actions = {}
+        self.errors = Counter()
+        self.missed = 0
+        self.http_requests = 0
+        self.elapsed = 0.0
+
+    def record(self, name, scheduled, started, finished, error=None):
+        latency = round((finished - scheduled) * 1_000_000)
+        self.latency.record(latency)
+        self.service_time.record(round((finished - started) * 1_000_000))
+        stats = self.actions.setdefault(name, ActionStats())
+        stats.count += 1
+        stats.latency.record(latency)
+        if error is not None:
+            stats.errors += 1
+            self.errors[str(error) if error.args else type(error).__name__] += 1
+
+    def as_dict(self):
+        completed = self.latency.count
+        errors = sum(self.errors.values())
+        return {
+            'elapsed_s': self.elapsed,
+            'requests': completed,
+            'http_requests': self.http_requests,
+            'missed': self.missed,
+            'throughput_rps': completed / self.elapsed if self.elapsed else 0.0,
+            'http_throughput_rps': self.http_requests / self.elapsed if self.elapsed else 0.0,
+            'errors': {
+                'count': errors,
+                'rate': errors / completed if completed else 0.0,
+                'by_kind': dict(self.errors.most_common()),
+            },
+            'latency_ms': self.latency.summary(),
+            'service_time_ms': self.service_time.summary(),
+            'actions': {name: stats.as_dict() for name, stats in sorted(self.actions.items())},
+        }
+
+
+class LoadRunner:
+    """
+    Send scheduled arrivals over `concurrency` keep-alive connections.
+
+    With ``open_loop`` false (no arrival rate) the queue holds at most one
+    arrival per connection, so each connection sends as fast as it gets
+    answers. The run ends after `duration` seconds, `max_requests`
+    arrivals or the end of the schedule, whichever comes first; arrivals
+    still waiting for a connection at the deadline count as missed.
+    """
+
+    def __init__(self, base_url, concurrency=10, duration=None, max_requests=None,
+                 timeout=30.0, open_loop=True):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.duration = duration
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self.open_loop = open_loop
+
+    async def run(self, schedule):
+        loop = asyncio.get_running_loop()
+        results = Results()
+        queue = asyncio.Queue(maxsize=0 if self.open_loop else self.concurrency)
+        connections = [Connection(self.base_url, self.timeout) for _ in range(self.concurrency)]
+
+        start = loop.time()
+        deadline = start + self.duration if self.duration is not None else None
+        workers = [
+            asyncio.create_task(self._work(connection, queue, results, deadline))
+            for connection in connections
+        ]
+        try:
+            await self._produce(schedule, queue, start, deadline)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            for connection in connections:
+                await connection.close()
+        results.elapsed = loop.time() - start
+        results.http_requests = sum(connection.requests for connection in connections)
+        return results
+
+    async def _produce(self, schedule, queue, start, deadline):
+        loop = asyncio.get_running_loop()
+        for sent, (offset, name, action) in enumerate(schedule):
+            if self.max_requests is not None and sent >= self.max_requests:
+                return
+            scheduled = start + offset
+            if deadline is not None and max(scheduled, loop.time()) >= deadline:
+                return
+            if scheduled > loop.time():
+                await asyncio.sleep(scheduled - loop.time())
+            # Closed-loop arrivals have no schedule of their own; they start when sent.
+            await queue.put((scheduled if self.open_loop else None, name, action))
+
+    async def _work(self, connection, queue, results, deadline):
+        loop = asyncio.get_running_loop()
+        while (item := await queue.get()) is not None:
+            scheduled, name, action = item
+            started = loop.time()
+            scheduled = started if scheduled is None else scheduled
+            if deadline is not None and started > deadline:
+                results.missed += self.open_loop
+                continue
+            try:
+                await action(connection)
+            except Exception as error:
+                results.record(name, scheduled, started, loop.time(), error)
+            else:
+                results.record(name, scheduled, started, loop.time())
@@ -0,0 +1,190 @@
+"""
+Traffic sources for the load test
+
+Both sources yield ``(offset_seconds, name, action)`` arrivals, where
+``action`` is a coroutine function taking a ``Connection`` and raising on
+an unexpected response. The runner sends each arrival at its offset.
+"""
+import itertools
+import random
+import re
+from datetime import datetime
+from functools import partial
+from urllib.parse import urlsplit
+
+from django.urls import Resolver404, resolve, reverse
+
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+# Relative weights of the scenario actions; override some with --weight name=N.
+DEFAULT_WEIGHTS = {
+    'home': 10,
+    'contact': 5,
+    'person_list': 25,
+    'person_detail': 30,
+    'person_create': 12,
+    'person_update': 10,
+    'person_delete': 8,
+}
+
+
+class LoadTestError(Exception):
+    """A response the scenario did not expect"""
+
+
+def check(response, redirect=False):
+    if response.status >= 400:
+        raise LoadTestError(f'HTTP {response.status}')
+    if redirect and not 300 <= response.status < 400:
+        raise LoadTestError(f'Form rejected with HTTP {response.status}')
+    return response
+
+
+async def submit_form(connection, path, data, redirect=True):
+    """GET a form, POST it back with its CSRF token, and follow the redirect like a browser"""
+    page = check(await connection.get(path))
+    token = CSRF_INPUT.search(page.text)
+    if token is None:
+        raise LoadTestError(f'No CSRF token on {path}')
+    response = check(await connection.post(path, {**data, 'csrfmiddlewaretoken': token[1]}), redirect)
+    if redirect:
+        location = urlsplit(response.headers['location'])
+        check(await connection.get(location.path + (f'?{location.query}' if location.query else '')))
+    return response
+
+
+class Scenario:
+    """
+    Weighted mix of page views and form posts over the site's real routes.
+
+    People created during the run are leased to one action at a time, so a
+    delete never races a detail view or update of the same person.
+    """
+
+    def __init__(self, weights=None, seed=None):
+        unknown = set(weights or ()) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f'Unknown scenario actions: {", ".join(sorted(unknown))}')
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.random = random.Random(seed)
+        self.run_id = f'{self.random.getrandbits(32):08x}'
+        self.serial = itertools.count()
+        self.people = []
+
+    def schedule(self, rate=None):
+        """Endless arrivals: a Poisson process at `rate` per second, or all due at once"""
+        names = [name for name, weight in self.weights.items() if weight > 0]
+        weights = [self.weights[name] for name in names]
+        offset = 0.0
+        while True:
+            if rate:
+                offset += self.random.expovariate(rate)
+            name = self.random.choices(names, weights)[0]
+            yield offset, name, getattr(self, name)
+
+    async def seed(self, connection, count):
+        """Create `count` people up front so reads and edits have something to hit"""
+        for _ in range(count):
+            await self.person_create(connection)
+
+    def _person_data(self):
+        n = next(self.serial)
+        return {
+            'first_name': f'Load{n}',
+            'last_name': f'Test{n % 97:02d}',
+            'email': f'loadtest.{self.run_id}.{n}@example.com',
+        }
+
+    async def home(self, connection):
+        check(await connection.get(reverse('public:home')))
+
+    async def contact(self, connection):
+        await submit_form(connection, reverse('public:contact'), {
+            'name': 'Load Test',
+            'email': 'loadtest@example.com',
+            'subject': 'Load test',
+            'message': 'Sent by manage.py loadtest.',
+        }, redirect=False)
+
+    async def person_list(self, connection):
+        check(await connection.get(reverse('sample:person_list')))
+
+    async def person_detail(self, connection):
+        if not self.people:
+            return await self.person_create(connection)
+        person = self.people.pop(self.random.randrange(len(self.people)))
+        try:
+            check(await connection.get(reverse('sample:person_detail', args=[person[0]])))
+        finally:
+            self.people.append(person)
+
+    async def person_create(self, connection):
+        data = self._person_data()
+        response = await submit_form(connection, reverse('sample:person_create'), data)
+        pk = resolve(urlsplit(response.headers['location']).path).kwargs['pk']
+        self.people.append((pk, data['email']))
+
+    async def person_update(self, connection):
+        if not self.people:
+            return await self.person_create(connection)
+        pk, email = self.people.pop(self.random.randrange(len(self.people)))
+        data = {**self._person_data(), 'email': email}
+        try:
+            response = await submit_form(connection, reverse('sample:person_update', args=[pk]), data)
+            # A moved person (e.g. to another shard) comes back under its new pk.
+            pk = resolve(urlsplit(response.headers['location']).path).kwargs['pk']
+        finally:
+            self.people.append((pk, email))
+
+    async def person_delete(self, connection):
+        if not self.people:
+            return await self.person_create(connection)
+        pk, _ = self.people.pop(self.random.randrange(len(self.people)))
+        await submit_form(connection, reverse('sample:person_delete', args=[pk]), {})
+
+
+# host ident user [10/Oct/2000:13:55:36 -0700] "GET /path HTTP/1.1" 200 2326 ...
+LOG_LINE = re.compile(r'\[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+)[^"]*"')
+
+
+class AccessLog:
+    """
+    Replay of the GET and HEAD requests in a Common or Combined Log Format log.
+
+    Other methods are counted in ``skipped``: logs carry no request bodies
+    or CSRF tokens to send. Offsets follow the log's timestamps divided by
+    ``speed``, so 2.0 replays an hour of traffic in half an hour.
+    """
+
+    def __init__(self, lines, speed=1.0):
+        self.lines = lines
+        self.speed = speed
+        self.skipped = 0
+        self.unparsed = 0
+
+    def schedule(self, rate=None):
+        start = None
+        for line in self.lines:
+            match = LOG_LINE.search(line)
+            if match is None:
+                self.unparsed += line.strip() != ''
+                continue
+            if match['method'] not in ('GET', 'HEAD'):
+                self.skipped += 1
+                continue
+            when = datetime.strptime(match['time'], '%d/%b/%Y:%H:%M:%S %z')
+            start = start or when
+            offset = (when - start).total_seconds() / self.speed
+            yield offset, route_name(match['path']), partial(replay, match['method'], match['path'])
+
+
+def route_name(path):
+    """URL name of a logged path, for grouping results"""
+    try:
+        return resolve(urlsplit(path).path).view_name
+    except Resolver404:
+        return 'unresolved'
+
+
+async def replay(method, path, connection):
+    check(await connection.request(method, path))
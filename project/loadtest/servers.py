@@ -0,0 +1,70 @@
+"""
+Local servers for the load test to run against
+
+Each is a context manager that serves the project from a background thread
+of this process and yields its base URL. The load generator shares the
+process (and the GIL) with them, so for absolute numbers point ``--url`` at
+a separately started server instead.
+"""
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.servers.basehttp import (
+    ThreadedWSGIServer,
+    WSGIRequestHandler,
+    get_internal_wsgi_application,
+)
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    """Keep-alive capable runserver handler without a log line per request"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def wsgi_server(host='127.0.0.1', port=0):
+    """Serve WSGI_APPLICATION with Django's threaded development server"""
+    server = ThreadedWSGIServer((host, port), QuietWSGIRequestHandler, allow_reuse_address=True)
+    server.set_app(get_internal_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://{host}:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+@contextmanager
+def asgi_server(host='127.0.0.1', port=0):
+    """Serve the project's ASGI application with uvicorn (an optional dependency)"""
+    import uvicorn
+    from django.core.asgi import get_asgi_application
+
+    if not port:
+        with socket.socket() as probe:
+            probe.bind((host, 0))
+            port = probe.getsockname()[1]
+    config = uvicorn.Config(
+        get_asgi_application(), host=host, port=port, log_level='warning', lifespan='off'
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f'uvicorn failed to start on {host}:{port}')
+        time.sleep(0.01)
+    try:
+        yield f'http://{host}:{port}'
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+SERVERS = {'wsgi': wsgi_server, 'asgi': asgi_server}
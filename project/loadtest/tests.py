@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import LiveServerTestCase, SimpleTestCase
+from project.sample.models import Person
+from .histogram import Histogram
+from .scenarios import AccessLog, Scenario
+
+
+class HistogramTest(SimpleTestCase):
+    """Test cases for the HDR-style latency histogram"""
+
+    def test_percentiles_keep_three_significant_figures(self):
+        """Test that percentiles over a wide range stay within 0.1% of the exact value"""
+        histogram = Histogram(significant_figures=3)
+        values = list(range(1, 1_000_001, 7))
+        for value in values:
+            histogram.record(value)
+
+        for percent in (50, 90, 99, 99.9):
+            exact = values[max(int(len(values) * percent / 100 + 0.999999) - 1, 0)]
+            self.assertAlmostEqual(histogram.percentile(percent), exact, delta=exact / 1000)
+        self.assertEqual(histogram.percentile(100), values[-1])
+        self.assertEqual(histogram.min, 1)
+
+    def test_merge_and_summary(self):
+        """Test that merged histograms summarise like one histogram"""
+        first, second = Histogram(), Histogram()
+        for value in (1000, 2000):
+            first.record(value)
+        second.record(30_000)
+        first.merge(second)
+
+        summary = first.summary()
+        self.assertEqual(first.count, 3)
+        self.assertEqual(summary['min'], 1.0)
+        self.assertEqual(summary['max'], 30.0)
+        self.assertEqual(summary['p50'], 2.0)
+        self.assertAlmostEqual(summary['mean'], 11.0)
+
+
+class TrafficSourceTest(SimpleTestCase):
+    """Test cases for scenario and access log arrival schedules"""
+
+    def test_access_log_offsets_and_skips(self):
+        """Test that replay keeps GET/HEAD lines, scales time and names routes"""
+        log = AccessLog([
+            '1.2.3.4 - - [19/Oct/2026:10:00:00 +0000] "GET /sample/people/ HTTP/1.1" 200 10',
+            '1.2.3.4 - - [19/Oct/2026:10:00:02 +0000] "POST /contact/ HTTP/1.1" 200 10',
+            'not a log line',
+            '1.2.3.4 - - [19/Oct/2026:10:00:04 +0000] "HEAD /sample/people/7/ HTTP/1.1" 200 0 "-" "ua"',
+        ], speed=2.0)
+
+        arrivals = [(offset, name) for offset, name, _ in log.schedule()]
+        self.assertEqual(arrivals, [(0.0, 'sample:person_list'), (2.0, 'sample:person_detail')])
+        self.assertEqual((log.skipped, log.unparsed), (1, 1))
+
+    def test_scenario_open_loop_arrival_rate(self):
+        """Test that scenario arrivals average the requested rate and respect weights"""
+        scenario = Scenario({'home': 1, 'contact': 0, 'person_list': 0, 'person_detail': 0,
+                             'person_create': 0, 'person_update': 0, 'person_delete': 0}, seed=7)
+        arrivals = [arrival for arrival, _ in zip(scenario.schedule(rate=50), range(5000))]
+
+        self.assertAlmostEqual(arrivals[-1][0], 100, delta=5)
+        self.assertEqual({name for _, name, _ in arrivals}, {'home'})
+
+    def test_unreadable_replay_log(self):
+        """Test that a missing access log is reported as a command error"""
+        with self.assertRaisesMessage(CommandError, 'Cannot read'):
+            call_command('loadtest', replay=os.path.join(tempfile.gettempdir(), 'no-such.log'),
+                         url='http://127.0.0.1:9', stdout=StringIO())
+
+    def test_unknown_scenario_action(self):
+        """Test that weights for unknown actions are rejected"""
+        with self.assertRaises(ValueError):
+            Scenario({'person_explode': 1})
+
+
+class LoadtestCommandTest(LiveServerTestCase):
+    """Test cases for running the scenario against a live server"""
+
+    def test_scenario_runs_without_errors(self):
+        """Test that every scenario action succeeds, including CSRF form posts"""
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'report.json')
+            call_command(
+                'loadtest', url=self.live_server_url, requests=60, concurrency=3,
+                seed_people=3, random_seed=1, output=output, stderr=StringIO(),
+            )
+            with open(output) as report_file:
+                report = json.load(report_file)
+
+        self.assertEqual(report['requests'], 60)
+        self.assertEqual(report['errors']['count'], 0, report['errors'])
+        self.assertEqual(set(report['actions']), set(report['weights']))
+        self.assertGreater(report['http_requests'], report['requests'])
+        self.assertGreater(report['latency_ms']['p99'], 0)
+        self.assertTrue(Person.objects.filter(email__startswith='loadtest.').exists())
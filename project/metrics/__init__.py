@@ -0,0 +1,13 @@
+"""
+Metrics app
+
+Per-view request metrics shared across worker processes:
+- Counters and histograms stored in memory-mapped files, one per writer thread
+- Middleware recording latency, status, response size and DB time per URL name
+- Aggregation across all files into the Prometheus text exposition format
+
+Writers never lock; each thread appends to its own file and the ``/metrics``
+view sums every file in ``METRICS_DIR`` when scraped.
+"""
+
+default_app_config = 'project.metrics.apps.MetricsConfig'
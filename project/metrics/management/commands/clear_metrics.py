@@ -0,0 +1,14 @@
+"""
+Management command to delete collected metric files
+"""
+from django.core.management.base import BaseCommand
+
+from project.metrics import store
+
+
+class Command(BaseCommand):
+    help = 'Delete all metric files in METRICS_DIR (run before starting workers)'
+
+    def handle(self, *args, **options):
+        store.clear()
+        self.stdout.write(self.style.SUCCESS(f'Cleared metrics in {store.metrics_dir()}'))
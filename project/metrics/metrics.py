@@ -0,0 +1,134 @@
+"""
+Metric types, the registry and Prometheus text exposition
+"""
+from bisect import bisect_left
+from collections import defaultdict
+
+from . import store
+
+registry = {}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Metric:
+    """A named metric family with a fixed tuple of label names"""
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        if registry.get(name, self) is not self:
+            raise ValueError(f'A metric named "{name}" is already registered.')
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry[name] = self
+
+    def samples(self, values):
+        """Yield (sample name, label pairs, value) from collected {(suffix, labels): value}"""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, labels, amount=1.0):
+        """Increment the series for a tuple of label values"""
+        store.writer().add((self.name, '', labels), amount)
+
+    def samples(self, values):
+        for (_, labels), value in sorted(values.items()):
+            yield self.name + '_total', list(zip(self.labelnames, labels)), value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels, value):
+        """Record one observation; stores the bucket hit and the running sum"""
+        file = store.writer()
+        file.add((self.name, 'bucket', labels, bisect_left(self.buckets, value)), 1.0)
+        file.add((self.name, 'sum', labels), value)
+
+    def samples(self, values):
+        series = defaultdict(lambda: {'buckets': [0.0] * (len(self.buckets) + 1), 'sum': 0.0})
+        for key, value in values.items():
+            suffix, labels = key[0], key[1]
+            if suffix == 'bucket':
+                index = key[2]
+                if 0 <= index <= len(self.buckets):
+                    series[labels]['buckets'][index] += value
+            elif suffix == 'sum':
+                series[labels]['sum'] += value
+
+        bounds = [_format_value(bound) for bound in self.buckets] + ['+Inf']
+        for labels, data in sorted(series.items()):
+            pairs = list(zip(self.labelnames, labels))
+            cumulative = 0.0
+            for bound, count in zip(bounds, data['buckets']):
+                cumulative += count
+                yield self.name + '_bucket', pairs + [('le', bound)], cumulative
+            yield self.name + '_sum', pairs, data['sum']
+            yield self.name + '_count', pairs, cumulative
+
+
+def render():
+    """Aggregate all processes' files into Prometheus text format 0.0.4"""
+    grouped = defaultdict(dict)
+    for key, value in store.collect().items():
+        grouped[key[0]][key[1:]] = value
+
+    lines = []
+    for name, metric in sorted(registry.items()):
+        lines.append(f'# HELP {name} {_escape_help(metric.documentation)}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        for sample, pairs, value in metric.samples(grouped.get(name, {})):
+            labels = ','.join(f'{label}="{_escape_label(str(v))}"' for label, v in pairs)
+            if labels:
+                sample = f'{sample}{{{labels}}}'
+            lines.append(f'{sample} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _format_value(value):
+    return repr(float(value))
+
+
+def _escape_help(text):
+    return text.replace('\\', r'\\').replace('\n', r'\n')
+
+
+def _escape_label(text):
+    return text.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+http_requests = Counter(
+    'django_http_requests',
+    'Requests handled, by URL name, method and status code.',
+    ('view', 'method', 'status'),
+)
+http_request_duration = Histogram(
+    'django_http_request_duration_seconds',
+    'Time spent producing a response, by URL name.',
+    ('view',),
+)
+http_response_size = Histogram(
+    'django_http_response_size_bytes',
+    'Size of non-streaming response bodies, by URL name.',
+    ('view',),
+    buckets=SIZE_BUCKETS,
+)
+http_db_duration = Histogram(
+    'django_http_db_duration_seconds',
+    'Time spent in database queries per request, by URL name.',
+    ('view',),
+)
+http_db_queries = Counter(
+    'django_http_db_queries',
+    'Database queries executed, by URL name.',
+    ('view',),
+)
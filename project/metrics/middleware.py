@@ -0,0 +1,107 @@
+"""
+Metrics middleware
+"""
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import (
+    http_db_duration,
+    http_db_queries,
+    http_request_duration,
+    http_response_size,
+    http_requests,
+)
+
+UNRESOLVED = '<unresolved>'
+KNOWN_METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+
+
+class QueryTimer:
+    """Database execute wrapper that accumulates query time and count"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+_request_timer = ContextVar('metrics_query_timer', default=None)
+
+
+def time_queries(execute, sql, params, many, context):
+    """
+    Execute wrapper installed once on every connection.
+
+    It charges each query to the timer of the request being handled, if any.
+    sync_to_async copies the context into its worker thread, so queries from
+    async views are charged too.
+    """
+    timer = _request_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status, response size and DB time per URL name.
+
+    Place it first in MIDDLEWARE so the timings cover the whole stack. DB
+    time comes from ``time_queries``, which every connection gets when it
+    opens, so a request costs one context variable set and reset.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timer = QueryTimer()
+        token = _request_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        token = _request_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    @staticmethod
+    def record(request, response, duration, timer):
+        match = request.resolver_match
+        view = (match.view_name if match else None) or UNRESOLVED
+        labels = (view,)
+        method = request.method if request.method in KNOWN_METHODS else 'other'
+        http_requests.inc((view, method, str(response.status_code)))
+        http_request_duration.observe(labels, duration)
+        if not response.streaming:
+            http_response_size.observe(labels, len(response.content))
+        http_db_duration.observe(labels, timer.seconds)
+        if timer.queries:
+            http_db_queries.inc(labels, timer.queries)
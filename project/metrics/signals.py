@@ -0,0 +1,23 @@
+"""
+Metrics signal handlers
+"""
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import store
+from .middleware import time_queries
+
+
+@receiver(setting_changed)
+def reset_writers_on_metrics_dir_change(setting, **kwargs):
+    """Point writers at the new directory when tests override METRICS_DIR"""
+    if setting == 'METRICS_DIR':
+        store.reset()
+
+
+@receiver(connection_created)
+def install_query_timer(connection, **kwargs):
+    """Time this connection's queries for MetricsMiddleware, once per connection"""
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
@@ -0,0 +1,149 @@
+"""
+Memory-mapped metric storage
+
+Each writer thread owns one file named ``metrics_<pid>_<thread>.db`` in
+``settings.METRICS_DIR``. A file is a header holding the number of bytes in
+use, followed by entries of::
+
+    key length (uint32) | JSON key, zero padded to 8 bytes | value (float64)
+
+Values are 8-byte aligned native doubles, so writers update them in place
+through a memoryview without struct packing or locking. Entries are only
+ever appended, and the header is bumped after an entry is complete, so
+readers in other processes can parse a file while its owner keeps writing.
+Files are machine-local and use the host's native byte order.
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+_HEADER = struct.Struct('=Q')
+_KEY_LENGTH = struct.Struct('=I')
+_VALUE = struct.Struct('=d')
+_INITIAL_SIZE = 64 * 1024
+
+_local = threading.local()
+
+
+class MetricsFile:
+    """Append-only key/value file written by exactly one thread"""
+
+    def __init__(self, path):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size < _INITIAL_SIZE:
+                os.ftruncate(fd, _INITIAL_SIZE)
+                size = _INITIAL_SIZE
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._values = memoryview(self._mmap).cast('d')
+        self._used = _HEADER.unpack_from(self._mmap, 0)[0] or _HEADER.size
+        self._slots = {
+            key: position // _VALUE.size
+            for key, position, _ in _entries(self._mmap, self._used)
+        }
+
+    def add(self, key, amount):
+        """Add amount to the value stored under key, creating it at zero"""
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._append(key)
+        self._values[slot] += amount
+
+    def _append(self, key):
+        encoded = json.dumps(key, separators=(',', ':')).encode('utf-8')
+        padded = len(encoded) + (-(_KEY_LENGTH.size + len(encoded)) % 8)
+        start = self._used
+        end = start + _KEY_LENGTH.size + padded + _VALUE.size
+        if end > len(self._mmap):
+            self._values.release()
+            self._mmap.resize(max(end, len(self._mmap) * 2))
+            self._values = memoryview(self._mmap).cast('d')
+
+        buffer = self._mmap
+        _KEY_LENGTH.pack_into(buffer, start, len(encoded))
+        buffer[start + _KEY_LENGTH.size:start + _KEY_LENGTH.size + len(encoded)] = encoded
+        position = end - _VALUE.size
+        _VALUE.pack_into(buffer, position, 0.0)
+        _HEADER.pack_into(buffer, 0, end)
+        self._used = end
+        slot = self._slots[key] = position // _VALUE.size
+        return slot
+
+    def close(self):
+        self._values.release()
+        self._mmap.close()
+
+
+def _entries(buffer, used):
+    """Yield (key, value position, value) for every complete entry"""
+    offset = _HEADER.size
+    while offset < used:
+        length = _KEY_LENGTH.unpack_from(buffer, offset)[0]
+        key_start = offset + _KEY_LENGTH.size
+        encoded = bytes(buffer[key_start:key_start + length])
+        position = key_start + length + (-(_KEY_LENGTH.size + length) % 8)
+        yield _as_key(json.loads(encoded)), position, _VALUE.unpack_from(buffer, position)[0]
+        offset = position + _VALUE.size
+
+
+def _as_key(value):
+    """Turn the decoded JSON lists back into the tuples writers use"""
+    if isinstance(value, list):
+        return tuple(_as_key(item) for item in value)
+    return value
+
+
+def metrics_dir():
+    return str(settings.METRICS_DIR)
+
+
+def writer():
+    """The calling thread's metrics file"""
+    try:
+        return _local.file
+    except AttributeError:
+        directory = metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'metrics_{os.getpid()}_{threading.get_ident()}.db')
+        _local.file = MetricsFile(path)
+        return _local.file
+
+
+def reset():
+    """Forget the writer of every thread, e.g. after a fork or a settings change"""
+    global _local
+    _local = threading.local()
+
+
+def collect():
+    """Sum the values of every key across all metric files"""
+    totals = defaultdict(float)
+    for path in glob.glob(os.path.join(metrics_dir(), 'metrics_*.db')):
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        if len(data) < _HEADER.size:
+            continue
+        used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+        for key, _, value in _entries(data, used):
+            totals[key] += value
+    return totals
+
+
+def clear():
+    """Delete all metric files; call before starting a fresh set of workers"""
+    reset()
+    for path in glob.glob(os.path.join(metrics_dir(), 'metrics_*.db')):
+        os.remove(path)
+
+
+os.register_at_fork(after_in_child=reset)
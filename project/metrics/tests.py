@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+import time
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+from project.outbox.models import OutboxConsumer
+from project.sample.models import Person
+from project.testing import TempDirSettingMixin
+from . import store
+from .metrics import Counter, Histogram, registry, render
+from .middleware import MetricsMiddleware
+
+
+def _count_in_child(directory, times):
+    """Runs in a forked worker process"""
+    with override_settings(METRICS_DIR=directory):
+        counter = registry['test_forked_events']
+        for _ in range(times):
+            counter.inc(('child',))
+
+
+class MetricsStoreTest(TempDirSettingMixin, SimpleTestCase):
+    """Test cases for the memory-mapped metric files"""
+    temp_dir_setting = 'METRICS_DIR'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if 'test_forked_events' not in registry:
+            Counter('test_forked_events', 'Events counted by forked workers.', ('source',))
+            Histogram('test_sizes', 'Test histogram.', ('kind',), buckets=(1, 10))
+
+    def test_values_persist_and_reload(self):
+        """Test that a reopened file keeps its keys and values"""
+        path = os.path.join(self.tmp.name, 'metrics_1_1.db')
+        first = store.MetricsFile(path)
+        first.add(('a', '', ('x',)), 2)
+        first.add(('a', '', ('y',)), 3)
+        first.close()
+
+        second = store.MetricsFile(path)
+        second.add(('a', '', ('x',)), 1)
+        self.assertEqual(store.collect(), {('a', '', ('x',)): 3.0, ('a', '', ('y',)): 3.0})
+
+    def test_file_grows_past_initial_size(self):
+        """Test that appending many keys resizes the mapping"""
+        file = store.writer()
+        for i in range(5000):
+            file.add(('grow', '', (f'label-{i}',)), i)
+        totals = store.collect()
+        self.assertEqual(len(totals), 5000)
+        self.assertEqual(totals[('grow', '', ('label-4999',))], 4999.0)
+
+    def test_processes_aggregate_without_locks(self):
+        """Test that forked workers write separate files that sum up"""
+        registry['test_forked_events'].inc(('child',))
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_count_in_child, args=(self.tmp.name, 100))
+            for _ in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+        self.assertIn('test_forked_events_total{source="child"} 301.0', render())
+        self.assertEqual(len(os.listdir(self.tmp.name)), 4)
+
+    def test_histogram_exposition(self):
+        """Test cumulative buckets, sum and count"""
+        histogram = registry['test_sizes']
+        for value in (0.5, 5, 5, 50):
+            histogram.observe(('a"b',), value)
+        output = render()
+        self.assertIn('# TYPE test_sizes histogram', output)
+        self.assertIn('test_sizes_bucket{kind="a\\"b",le="1.0"} 1.0', output)
+        self.assertIn('test_sizes_bucket{kind="a\\"b",le="10.0"} 3.0', output)
+        self.assertIn('test_sizes_bucket{kind="a\\"b",le="+Inf"} 4.0', output)
+        self.assertIn('test_sizes_sum{kind="a\\"b"} 60.5', output)
+        self.assertIn('test_sizes_count{kind="a\\"b"} 4.0', output)
+
+
+class MetricsMiddlewareTest(TempDirSettingMixin, TestCase):
+    """Test cases for per-view request metrics"""
+    temp_dir_setting = 'METRICS_DIR'
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        Person.objects.create(first_name="Jane", last_name="Smith", email="jane.smith@example.com")
+
+    def test_metrics_per_url_name(self):
+        """Test that requests are recorded under their URL name"""
+        self.client.get(reverse('sample:person_list'))
+        self.client.get(reverse('sample:person_list'))
+        self.client.get('/no-such-page/')
+
+        response = self.client.get(reverse('metrics:metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        output = response.content.decode()
+        self.assertIn(
+            'django_http_requests_total{view="sample:person_list",method="GET",status="200"} 2.0',
+            output,
+        )
+        self.assertIn(
+            'django_http_requests_total{view="<unresolved>",method="GET",status="404"} 1.0',
+            output,
+        )
+        self.assertIn('django_http_request_duration_seconds_count{view="sample:person_list"} 2.0', output)
+        self.assertIn('django_http_response_size_bytes_count{view="sample:person_list"} 2.0', output)
+        self.assertIn('django_http_db_duration_seconds_count{view="sample:person_list"} 2.0', output)
+        self.assertIn('django_http_db_queries_total{view="sample:person_list"} 2.0', output)
+
+    async def test_async_requests_record_db_time(self):
+        """Test that queries an async view runs through sync_to_async are counted"""
+        consumer = OutboxConsumer(name='metrics')
+        token = consumer.issue_token()
+        await consumer.asave()
+        await self.async_client.get(
+            reverse('outbox:changes'), {'wait': 0}, headers={'Authorization': f'Bearer {token}'}
+        )
+        response = await self.async_client.get(reverse('metrics:metrics'))
+        self.assertIn('django_http_db_queries_total{view="outbox:changes"}', response.content.decode())
+
+    def test_recording_overhead(self):
+        """Microbenchmark: the middleware adds under 10 microseconds to a request"""
+        request = RequestFactory().get(reverse('sample:person_list'))
+        request.resolver_match = resolve(request.path)
+        response = HttpResponse(b'x' * 2048)
+
+        def view(request):
+            return response
+
+        def per_call(handler, calls=2000):
+            # Best of several batches, so a busy machine does not fail the test.
+            best = float('inf')
+            for _ in range(5):
+                start = time.perf_counter()
+                for _ in range(calls):
+                    handler(request)
+                best = min(best, (time.perf_counter() - start) / calls)
+            return best
+
+        middleware = MetricsMiddleware(view)
+        middleware(request)
+        self.assertLess(per_call(middleware) - per_call(view), 10e-6)
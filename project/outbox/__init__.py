@@ -0,0 +1,13 @@
+"""
+Outbox app
+
+Transactional change feed for published models:
+- OutboxEvent rows written in the same transaction as the change they describe
+- Consumer positions so consumed events can be compacted away
+- ``compact_outbox`` management command
+
+Events carry a monotonically increasing sequence id (the primary key), so a
+consumer follows the feed by asking for events after the last id it saw.
+"""
+
+default_app_config = 'project.outbox.apps.OutboxConfig'
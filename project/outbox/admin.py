@@ -0,0 +1,16 @@
+from django.contrib import admin
+from .models import OutboxConsumer, OutboxEvent
+
+# Register your models here.
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'topic', 'object_pk', 'action', 'created_at']
+    list_filter = ['topic', 'action']
+    readonly_fields = ['topic', 'object_pk', 'action', 'payload', 'created_at']
+
+
+@admin.register(OutboxConsumer)
+class OutboxConsumerAdmin(admin.ModelAdmin):
+    list_display = ['name', 'last_id', 'updated_at']
+    search_fields = ['name']
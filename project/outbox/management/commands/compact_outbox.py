@@ -0,0 +1,73 @@
+"""
+Management command to delete outbox events every consumer has acknowledged
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from project.outbox.models import OutboxConsumer, OutboxEvent
+from project.sharding.shards import scatter
+
+
+class Command(BaseCommand):
+    help = 'Delete outbox events acknowledged by all consumers, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-hours',
+            type=float,
+            help='Also delete events older than this, even if a consumer has not read them',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Events deleted per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--database',
+            help='Database whose outbox to compact, e.g. one Person shard (default: every shard)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be deleted without deleting it',
+        )
+
+    def handle(self, *args, **options):
+        if options['database']:
+            databases = [options['database']]
+        else:
+            # Each shard has its own outbox and consumer positions.
+            databases = [part.db for part in scatter(OutboxEvent.objects.all())]
+        for using in databases:
+            self.compact(using, options, label=f' on {using}' if len(databases) > 1 else '')
+
+    def compact(self, using, options, label=''):
+        events = OutboxEvent.objects.using(using)
+        consumers = OutboxConsumer.objects.using(using)
+        horizon = consumers.aggregate(horizon=Min('last_id'))['horizon'] or 0
+        if options['max_age_hours'] is not None:
+            cutoff = timezone.now() - timedelta(hours=options['max_age_hours'])
+            expired = events.filter(created_at__lt=cutoff).aggregate(last=Max('pk'))['last']
+            horizon = max(horizon, expired or 0)
+
+        consumed = events.filter(pk__lte=horizon)
+        if options['dry_run']:
+            self.stdout.write(f'Would delete {consumed.count()} events up to #{horizon}{label}')
+            return
+
+        deleted = 0
+        batch_size = options['batch_size']
+        while True:
+            # Slice on the pk index so each transaction stays short.
+            batch = list(consumed.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic(using=consumed.db):
+                count, _ = events.filter(pk__gte=batch[0], pk__lte=batch[-1]).delete()
+            deleted += count
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} events up to #{horizon}{label}'))
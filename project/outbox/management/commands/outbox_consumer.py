@@ -0,0 +1,32 @@
+"""
+Management command to register a change feed consumer and issue its token
+"""
+from django.core.management.base import BaseCommand
+from project.outbox.models import OutboxConsumer
+
+
+class Command(BaseCommand):
+    help = 'Register a change feed consumer, or rotate its token, and print the new bearer token'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help='Consumer name, passed as ?consumer= on the feed')
+        parser.add_argument(
+            '--after',
+            type=int,
+            default=0,
+            help='Starting position for a new consumer (default: 0)',
+        )
+        parser.add_argument(
+            '--database',
+            help='Database whose outbox the consumer follows, e.g. one Person shard (default: routed)',
+        )
+
+    def handle(self, *args, **options):
+        consumer, created = OutboxConsumer.objects.using(options['database']).get_or_create(
+            name=options['name'], defaults={'last_id': options['after']}
+        )
+        token = consumer.issue_token()
+        consumer.save(update_fields=['token_hash'])
+        verb = 'Registered' if created else 'Rotated the token for'
+        self.stderr.write(self.style.SUCCESS(f'{verb} consumer "{consumer.name}" at #{consumer.last_id}'))
+        self.stdout.write(token)
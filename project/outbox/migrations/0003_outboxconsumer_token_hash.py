@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outbox', '0002_alter_outboxevent_action'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxconsumer',
+            name='token_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+    ]
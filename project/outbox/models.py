@@ -0,0 +1,88 @@
+import hashlib
+import secrets
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+# Create your models here.
+
+class OutboxEventQuerySet(models.QuerySet):
+    """Reading the feed in sequence order"""
+
+    def after(self, sequence, topic=None):
+        """Events with a sequence id greater than `sequence`, oldest first"""
+        queryset = self.filter(pk__gt=sequence)
+        if topic:
+            queryset = queryset.filter(topic=topic)
+        return queryset.order_by('pk')
+
+
+class OutboxEvent(models.Model):
+    """A change to a published model, committed together with that change"""
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ARCHIVED = 'archived'
+    ACTION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+        (ARCHIVED, 'Archived'),
+    ]
+
+    topic = models.CharField(max_length=100)
+    object_pk = models.CharField(max_length=64)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    payload = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = OutboxEventQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Outbox event"
+        verbose_name_plural = "Outbox events"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['topic', 'id'], name='outbox_event_topic_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.topic} {self.object_pk} {self.action}"
+
+    def as_message(self):
+        """The JSON-ready form served to consumers"""
+        return {
+            'id': self.pk,
+            'topic': self.topic,
+            'object_pk': self.object_pk,
+            'action': self.action,
+            'payload': self.payload,
+            'created_at': self.created_at,
+        }
+
+
+class OutboxConsumer(models.Model):
+    """Highest sequence id a named consumer has acknowledged"""
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    # SHA-256 of the consumer's bearer token; the token itself is never stored.
+    token_hash = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Outbox consumer"
+        verbose_name_plural = "Outbox consumers"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def hash_token(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def issue_token(self):
+        """Give this consumer a new bearer token and return it; save() to revoke the old one"""
+        token = secrets.token_urlsafe(32)
+        self.token_hash = self.hash_token(token)
+        return token
@@ -0,0 +1,35 @@
+"""
+Writing outbox events
+
+Call these inside the transaction that makes the change. Published models
+implement ``outbox_payload()``; the topic is the model's ``app_label.model``.
+"""
+from .models import OutboxEvent
+
+
+def publish(instance, action, using=None):
+    """Record one change to `instance`"""
+    publish_many([instance], action, using=using)
+
+
+def publish_many(instances, action, using=None):
+    """Record the same kind of change for several instances in one INSERT"""
+    events = [
+        OutboxEvent(
+            topic=instance._meta.label_lower,
+            object_pk=str(instance.pk),
+            action=action,
+            payload=instance.outbox_payload() if action != OutboxEvent.DELETED else None,
+        )
+        for instance in instances
+    ]
+    if events:
+        OutboxEvent.objects.using(using).bulk_create(events)
+
+
+def publish_deleted(model, pks, using=None, action=OutboxEvent.DELETED):
+    """Record rows leaving the table when only the primary keys are at hand"""
+    OutboxEvent.objects.using(using).bulk_create([
+        OutboxEvent(topic=model._meta.label_lower, object_pk=str(pk), action=action)
+        for pk in pks
+    ])
@@ -0,0 +1,212 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import models, transaction
+from django.test import TestCase
+from django.urls import reverse
+from project.sample import models as sample_models
+from project.sample.cache import person_cache
+from project.sample.models import Person
+from .models import OutboxConsumer, OutboxEvent
+
+
+class OutboxRecordingTest(TestCase):
+    """Test cases for outbox events written alongside Person changes"""
+
+    def actions(self):
+        return list(OutboxEvent.objects.values_list('action', 'object_pk'))
+
+    def test_views_record_changes(self):
+        """Test that the sample views record create, update and delete events"""
+        self.client.post(reverse('sample:person_create'), {
+            'first_name': 'Bob', 'last_name': 'Johnson', 'email': 'bob@example.com'
+        })
+        person = Person.objects.get(email='bob@example.com')
+        self.client.post(reverse('sample:person_update', kwargs={'pk': person.pk}), {
+            'first_name': 'Robert', 'last_name': 'Johnson', 'email': 'bob@example.com'
+        })
+        self.client.post(reverse('sample:person_delete', kwargs={'pk': person.pk}))
+
+        pk = str(person.pk)
+        self.assertEqual(self.actions(), [('created', pk), ('updated', pk), ('deleted', pk)])
+        update = OutboxEvent.objects.get(action='updated')
+        self.assertEqual(update.topic, 'sample.person')
+        self.assertEqual(update.payload['full_name'], 'Robert Johnson')
+
+    def test_bulk_operations_record_changes(self):
+        """Test queryset bulk_create, update and delete, and the sample command"""
+        call_command('create_sample_people', count=3, stdout=StringIO())
+        Person.objects.filter(last_name='Doe').update(first_name='Johnny')
+        Person.objects.exclude(last_name='Doe').delete()
+
+        counts = {
+            action: OutboxEvent.objects.filter(action=action).count()
+            for action in ('created', 'updated', 'deleted')
+        }
+        self.assertEqual(counts, {'created': 3, 'updated': 1, 'deleted': 2})
+        self.assertEqual(
+            OutboxEvent.objects.get(action='updated').payload['first_name'], 'Johnny'
+        )
+
+        Person.objects.bulk_create([Person(first_name='A', last_name='B', email='ab@example.com')])
+        self.assertEqual(OutboxEvent.objects.filter(action='created').count(), 4)
+
+    def test_update_changes_only_the_rows_it_publishes(self):
+        """Test that a row matching mid-update is neither changed nor published"""
+        Person.objects.create(first_name='A', last_name='Doe', email='a@example.com')
+        update = models.QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            Person.objects.create(first_name='Late', last_name='Doe', email='late@example.com')
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(models.QuerySet, 'update', racing_update):
+            rows = Person.objects.filter(last_name='Doe').update(last_name='Roe')
+        self.assertEqual(rows, 1)
+        self.assertEqual(Person.objects.get(email='late@example.com').last_name, 'Doe')
+        self.assertEqual(OutboxEvent.objects.filter(action='updated').count(), 1)
+
+    def test_bulk_writes_run_in_chunks(self):
+        """Test that update() and delete() write, publish and invalidate per chunk of pks"""
+        for i in range(5):
+            Person.objects.create(first_name='P', last_name=str(i), email=f'p{i}@example.com')
+        with mock.patch.object(sample_models, 'WRITE_CHUNK_SIZE', 2), \
+                mock.patch.object(person_cache, 'invalidate') as invalidate:
+            self.assertEqual(Person.objects.update(first_name='Q'), 5)
+            self.assertEqual([len(call.args[0]) for call in invalidate.call_args_list], [2, 2, 1])
+            self.assertEqual(Person.objects.filter(first_name='Q').count(), 5)
+            self.assertEqual(OutboxEvent.objects.filter(action='updated').count(), 5)
+
+            self.assertEqual(Person.objects.all().delete(), (5, {'sample.Person': 5}))
+        self.assertEqual(OutboxEvent.objects.filter(action='deleted').count(), 5)
+
+    def test_admin_bulk_delete_records_changes(self):
+        """Test that the admin delete action records one event per person"""
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        people = [
+            Person.objects.create(first_name='P', last_name=str(i), email=f'p{i}@example.com')
+            for i in range(2)
+        ]
+        self.client.post(reverse('admin:sample_person_changelist'), {
+            'action': 'delete_selected',
+            'post': 'yes',
+            '_selected_action': [person.pk for person in people],
+        })
+        self.assertEqual(OutboxEvent.objects.filter(action='deleted').count(), 2)
+
+    def test_rolled_back_change_leaves_no_event(self):
+        """Test that events commit and roll back with the change"""
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Person.objects.create(first_name='A', last_name='B', email='ab@example.com')
+                raise RuntimeError()
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_compaction_trims_behind_slowest_consumer(self):
+        """Test that compact_outbox keeps events a consumer has not acknowledged"""
+        for i in range(5):
+            Person.objects.create(first_name='P', last_name=str(i), email=f'p{i}@example.com')
+        ids = list(OutboxEvent.objects.values_list('pk', flat=True))
+        OutboxConsumer.objects.create(name='search', last_id=ids[3])
+        OutboxConsumer.objects.create(name='cache', last_id=ids[1])
+
+        call_command('compact_outbox', batch_size=1, stdout=StringIO())
+        self.assertEqual(list(OutboxEvent.objects.values_list('pk', flat=True)), ids[2:])
+
+        call_command('compact_outbox', max_age_hours=0, stdout=StringIO())
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+class OutboxFeedTest(TestCase):
+    """Test cases for the change feed endpoint"""
+
+    def setUp(self):
+        """Set up test data"""
+        for i in range(3):
+            Person.objects.create(first_name='P', last_name=str(i), email=f'p{i}@example.com')
+        self.ids = list(OutboxEvent.objects.values_list('pk', flat=True))
+        self.url = reverse('outbox:changes')
+        self.consumer = OutboxConsumer(name='search')
+        self.token = self.consumer.issue_token()
+        self.consumer.save()
+        self.auth = {'Authorization': f'Bearer {self.token}'}
+
+    async def test_long_poll_returns_events_after_sequence(self):
+        """Test that the JSON feed pages through events by sequence id"""
+        response = await self.async_client.get(
+            self.url, {'after': self.ids[0], 'limit': 1}, headers=self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([event['id'] for event in data['events']], [self.ids[1]])
+        self.assertEqual(data['last_id'], self.ids[1])
+        self.assertEqual(data['events'][0]['topic'], 'sample.person')
+
+        response = await self.async_client.get(
+            self.url, {'after': self.ids[-1], 'wait': 0}, headers=self.auth
+        )
+        self.assertEqual(response.json(), {'events': [], 'last_id': self.ids[-1]})
+
+    async def test_consumer_position_is_recorded(self):
+        """Test that a named consumer's position moves forward only"""
+        await self.async_client.get(self.url, {'after': self.ids[1], 'consumer': 'search'}, headers=self.auth)
+        await self.async_client.get(self.url, {'after': self.ids[0], 'consumer': 'search'}, headers=self.auth)
+        consumer = await OutboxConsumer.objects.aget(name='search')
+        self.assertEqual(consumer.last_id, self.ids[1])
+
+    def test_feed_requires_authentication(self):
+        """Test that anonymous callers can neither read the feed nor register consumers"""
+        response = self.client.get(self.url, {'after': 0, 'consumer': 'spy', 'wait': 0})
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get(self.url, {'wait': 0}, headers={'Authorization': 'Bearer wrong'})
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(OutboxConsumer.objects.filter(name='spy').exists())
+
+    def test_only_a_consumers_token_moves_it(self):
+        """Test that staff may read, but positions move only with the consumer's own token"""
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get(self.url, {'wait': 0})
+        self.assertEqual(len(response.json()['events']), 3)
+        response = self.client.get(self.url, {'after': self.ids[2], 'consumer': 'search', 'wait': 0})
+        self.assertEqual(response.status_code, 403)
+        self.client.logout()
+
+        response = self.client.get(
+            self.url, {'after': self.ids[2], 'consumer': 'cache', 'wait': 0}, headers=self.auth
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(OutboxConsumer.objects.filter(name='cache').exists())
+        self.consumer.refresh_from_db()
+        self.assertEqual(self.consumer.last_id, 0)
+
+    def test_command_registers_and_rotates_tokens(self):
+        """Test that outbox_consumer prints a working token and revokes the old one"""
+        stdout = StringIO()
+        call_command('outbox_consumer', 'search', stdout=stdout, stderr=StringIO())
+        token = stdout.getvalue().strip()
+        self.assertNotEqual(token, self.token)
+        response = self.client.get(self.url, {'wait': 0}, headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, {'wait': 0}, headers=self.auth)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_event_stream(self):
+        """Test the server-sent event stream resuming from Last-Event-ID"""
+        response = await self.async_client.get(
+            self.url,
+            {'duration': 0},
+            headers={'Accept': 'text/event-stream', 'Last-Event-ID': str(self.ids[0]), **self.auth},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        self.assertNotIn(f'id: {self.ids[0]}\n', body)
+        self.assertIn(f'id: {self.ids[1]}\nevent: created\ndata: ', body)
+        self.assertIn(f'id: {self.ids[2]}\n', body)
+
+    def test_invalid_parameters(self):
+        """Test that malformed parameters are rejected"""
+        response = self.client.get(self.url, {'after': 'abc'})
+        self.assertEqual(response.status_code, 400)
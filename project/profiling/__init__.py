@@ -0,0 +1,14 @@
+"""
+Profiling app
+
+On-demand profiling of live requests, switched on from ``/profiling/``:
+- A statistical stack sampler writing collapsed stacks for flamegraphs, per view
+- tracemalloc snapshots diffed around a request, reported as top allocations per view
+- Selection by a fraction of requests, a URL name, or both, with automatic expiry
+
+The switch is a small control file in ``PROFILING_DIR`` that every worker
+process re-reads at most once a second, so idle requests only pay for a
+clock read. Set ``PROFILING_ENABLED = False`` to drop the middleware.
+"""
+
+default_app_config = 'project.profiling.apps.ProfilingConfig'
@@ -0,0 +1,150 @@
+"""
+Per-request captures and the report files they append to
+
+Reports are grouped by URL name: ``<view>.collapsed`` accumulates sampled
+stacks (flamegraph.pl sums repeated lines), and ``<view>.allocations.txt``
+collects one top-allocations block per profiled request. Appends are small
+single writes, so worker processes can share the files.
+"""
+import os
+import random
+import re
+import threading
+import time
+import tracemalloc
+
+from django.urls import Resolver404, resolve
+
+from .control import current, directory
+from .sampler import sampler
+
+TOP_ALLOCATIONS = 15
+UNRESOLVED = 'unresolved'
+REPORT_SUFFIXES = ('.collapsed', '.allocations.txt')
+
+_IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+
+def select(request, sample_stacks=True):
+    """
+    A Capture if this request should be profiled, otherwise None.
+
+    ``sample_stacks=False`` records allocations only, whatever the control
+    page asks for.
+    """
+    control = current()
+    if not control.active or not (control.memory or control.cpu and sample_stacks):
+        return None
+    if control.url_name and view_name(request) != control.url_name:
+        return None
+    if control.fraction < 1 and random.random() >= control.fraction:
+        return None
+    return Capture(control, sample_stacks)
+
+
+def view_name(request):
+    match = request.resolver_match
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return UNRESOLVED
+    return match.view_name or UNRESOLVED
+
+
+def report_path(view, suffix):
+    return directory() / (re.sub(r'[^\w.-]', '.', view) + suffix)
+
+
+def reports():
+    """(name, size in bytes, modified time) of every report file, newest first"""
+    if not directory().is_dir():
+        return []
+    files = [
+        (entry.name, entry.stat().st_size, entry.stat().st_mtime)
+        for entry in os.scandir(directory())
+        if entry.is_file() and entry.name.endswith(REPORT_SUFFIXES)
+    ]
+    return sorted(files, key=lambda item: item[2], reverse=True)
+
+
+class Capture:
+    """Stack samples and an allocation diff for one request"""
+
+    def __init__(self, control, sample_stacks=True):
+        self.control = control
+        self.cpu = control.cpu and sample_stacks
+        self.thread_id = threading.get_ident()
+        self.before = None
+
+    def start(self):
+        if self.cpu:
+            sampler.add(self, self.thread_id, self.control.interval_ms / 1000)
+        if self.control.memory:
+            self.before = _start_tracing()
+        self.started = time.perf_counter()
+
+    def finish(self, request, response):
+        duration = time.perf_counter() - self.started
+        view = view_name(request)
+        directory().mkdir(parents=True, exist_ok=True)
+        if self.cpu:
+            stacks = sampler.remove(self)
+            if stacks:
+                lines = ''.join(f'{stack} {count}\n' for stack, count in stacks.items())
+                with open(report_path(view, '.collapsed'), 'a') as report:
+                    report.write(lines)
+        if self.control.memory:
+            after, peak = _stop_tracing()
+            with open(report_path(view, '.allocations.txt'), 'a') as report:
+                report.write(self.allocation_report(request, response, duration, after, peak))
+
+    def allocation_report(self, request, response, duration, after, peak):
+        status = response.status_code if response is not None else 'error'
+        lines = [
+            f'# {time.strftime("%Y-%m-%dT%H:%M:%S%z")} {request.method} {request.get_full_path()} '
+            f'status={status} pid={os.getpid()} {duration * 1000:.1f} ms, '
+            f'traced peak {peak / 1024:.1f} KiB',
+        ]
+        diff = after.filter_traces(_IGNORED_TRACES).compare_to(
+            self.before.filter_traces(_IGNORED_TRACES), 'lineno'
+        )
+        for stat in sorted(diff, key=lambda stat: stat.size_diff, reverse=True)[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            lines.append(
+                f'{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  '
+                f'{frame.filename}:{frame.lineno}'
+            )
+        return '\n'.join(lines) + '\n\n'
+
+
+def _start_tracing():
+    """Start tracemalloc if nobody else has, and snapshot the heap"""
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if not _tracing_users and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_users += 1
+        tracemalloc.reset_peak()
+    return tracemalloc.take_snapshot()
+
+
+def _stop_tracing():
+    """Snapshot the heap, and stop tracemalloc after the last capture if we started it"""
+    global _tracing_users, _tracing_owned
+    snapshot = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    with _tracing_lock:
+        _tracing_users -= 1
+        if not _tracing_users and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+    return snapshot, peak
@@ -0,0 +1,90 @@
+"""
+Profiling switch shared by all worker processes
+
+The settings live in ``control.json`` in ``PROFILING_DIR``. ``current()``
+returns this process's cached copy and re-reads the file at most every
+``POLL_SECONDS``, which keeps the check on idle requests to a clock read.
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+POLL_SECONDS = 1.0
+CONTROL_FILE = 'control.json'
+
+
+class ProfilingControl:
+    """What to profile, and until when"""
+
+    def __init__(self, cpu=False, memory=False, fraction=1.0, url_name='',
+                 interval_ms=5, expires_at=0.0):
+        self.cpu = cpu
+        self.memory = memory
+        self.fraction = fraction
+        self.url_name = url_name
+        self.interval_ms = interval_ms
+        self.expires_at = expires_at
+
+    @property
+    def active(self):
+        return bool(self.cpu or self.memory) and time.time() < self.expires_at
+
+    def as_dict(self):
+        return {
+            'cpu': self.cpu,
+            'memory': self.memory,
+            'fraction': self.fraction,
+            'url_name': self.url_name,
+            'interval_ms': self.interval_ms,
+            'expires_at': self.expires_at,
+        }
+
+
+OFF = ProfilingControl()
+
+_current = OFF
+_next_check = 0.0
+_mtime = None
+
+
+def directory():
+    return Path(settings.PROFILING_DIR)
+
+
+def current():
+    """This process's view of the control file, refreshed at most every POLL_SECONDS"""
+    global _current, _next_check, _mtime
+    now = time.monotonic()
+    if now < _next_check:
+        return _current
+    _next_check = now + POLL_SECONDS
+    try:
+        mtime = os.stat(directory() / CONTROL_FILE).st_mtime_ns
+    except FileNotFoundError:
+        _current, _mtime = OFF, None
+        return _current
+    if mtime != _mtime:
+        try:
+            _current = ProfilingControl(**json.loads((directory() / CONTROL_FILE).read_text()))
+        except (ValueError, TypeError):
+            _current = OFF
+        _mtime = mtime
+    return _current
+
+
+def save(control):
+    """Write new settings for every process; this one applies them at once"""
+    directory().mkdir(parents=True, exist_ok=True)
+    staging = directory() / f'.{CONTROL_FILE}.{os.getpid()}'
+    staging.write_text(json.dumps(control.as_dict()))
+    os.replace(staging, directory() / CONTROL_FILE)
+    reset()
+
+
+def reset():
+    """Forget the cached copy so the next check re-reads the file"""
+    global _current, _next_check, _mtime
+    _current, _next_check, _mtime = OFF, 0.0, None
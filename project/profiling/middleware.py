@@ -0,0 +1,58 @@
+"""
+Profiling middleware
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .capture import select
+
+
+class ProfilingMiddleware:
+    """
+    Profile the requests selected on the profiling control page.
+
+    Idle, it costs one cached control lookup per request.
+
+    Under ASGI only allocations are recorded. Concurrent requests share the
+    event loop thread and sync views run in executor threads, so sampling
+    the thread that started the request would mix requests and miss the
+    view. Allocation diffs are process-wide and, with concurrent requests,
+    include their neighbours' allocations too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        capture = select(request)
+        if capture is None:
+            return self.get_response(request)
+        capture.start()
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            capture.finish(request, response)
+        return response
+
+    async def __acall__(self, request):
+        capture = select(request, sample_stacks=False)
+        if capture is None:
+            return await self.get_response(request)
+        capture.start()
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            capture.finish(request, response)
+        return response
@@ -0,0 +1,73 @@
+"""
+Statistical stack sampler
+
+One daemon thread per process wakes every ``interval`` seconds while any
+request is being profiled, reads the target threads' current frames via
+``sys._current_frames()`` and counts each stack in collapsed form
+(``outer;inner;leaf``), the input format of flamegraph.pl and speedscope.
+The profiled threads never run profiler code, so the cost is a short
+interruption per sample, not per function call.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def collapse(frame):
+    """Root-first ``module:function`` frames joined by semicolons"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f'{module}:{getattr(code, "co_qualname", code.co_name)}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """
+    Samples registered threads until they are removed.
+
+    Targets are keyed by their owner, not by thread id, so two captures that
+    run on the same thread each keep their own counts.
+    """
+
+    def __init__(self):
+        self.targets = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Condition(self.lock)
+        self.thread = None
+
+    def add(self, key, thread_id, interval):
+        with self.lock:
+            self.targets[key] = (thread_id, Counter(), interval)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+                self.thread.start()
+            self.wake.notify()
+
+    def remove(self, key):
+        """Stop sampling for ``key`` and return its stack counts"""
+        with self.lock:
+            _, stacks, _ = self.targets.pop(key, (None, Counter(), None))
+        return stacks
+
+    def run(self):
+        while True:
+            with self.lock:
+                while not self.targets:
+                    self.wake.wait()
+                interval = min(interval for _, _, interval in self.targets.values())
+            # Sleep outside the lock so requests can register and finish meanwhile.
+            time.sleep(interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, stacks, _ in self.targets.values():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse(frame)] += 1
+            del frames
+
+
+sampler = StackSampler()
@@ -0,0 +1,14 @@
+"""
+Profiling signal handlers
+"""
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from . import control
+
+
+@receiver(setting_changed)
+def reload_control_on_profiling_dir_change(setting, **kwargs):
+    """Read the control file from the new directory when tests override PROFILING_DIR"""
+    if setting == 'PROFILING_DIR':
+        control.reset()
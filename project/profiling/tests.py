@@ -0,0 +1,220 @@
+import json
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from project.testing import TempDirSettingMixin, with_jinja2_pages
+from . import control
+from .middleware import ProfilingMiddleware
+from .sampler import StackSampler
+
+
+def start(**options):
+    """Switch profiling on for a minute unless `expires_at` says otherwise"""
+    options.setdefault('expires_at', time.time() + 60)
+    control.save(control.ProfilingControl(**options))
+
+
+def slow_view(request):
+    """Stands in for a view worth profiling: burns CPU and allocates"""
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    request.kept = [bytearray(1024) for _ in range(500)]
+    return HttpResponse('ok')
+
+
+class ProfilingControlTest(TempDirSettingMixin, SimpleTestCase):
+    """Test cases for the control file shared by worker processes"""
+    temp_dir_setting = 'PROFILING_DIR'
+
+    def test_save_and_expiry(self):
+        """Test that saved settings apply at once and lapse when they expire"""
+        self.assertFalse(control.current().active)
+        start(cpu=True, url_name='sample:person_list')
+        self.assertTrue(control.current().active)
+        self.assertEqual(control.current().url_name, 'sample:person_list')
+
+        start(cpu=True, expires_at=time.time() - 1)
+        self.assertFalse(control.current().active)
+
+    def test_other_processes_changes_are_polled(self):
+        """Test that a change written elsewhere is picked up on the next poll, not per request"""
+        start(cpu=True)
+        self.assertTrue(control.current().cpu)
+        path = control.directory() / control.CONTROL_FILE
+        path.write_text(json.dumps({'memory': True, 'expires_at': time.time() + 60}))
+
+        self.assertTrue(control.current().cpu)
+        control.reset()  # as if POLL_SECONDS had passed
+        self.assertFalse(control.current().cpu)
+        self.assertTrue(control.current().memory)
+
+
+class ProfilingMiddlewareTest(TempDirSettingMixin, SimpleTestCase):
+    """Test cases for selecting and profiling requests"""
+    temp_dir_setting = 'PROFILING_DIR'
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.middleware = ProfilingMiddleware(slow_view)
+
+    def test_disabled_setting_removes_middleware(self):
+        """Test that PROFILING_ENABLED = False takes the middleware out of the stack"""
+        with override_settings(PROFILING_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(slow_view)
+
+    def test_idle_middleware_passes_through(self):
+        """Test that an idle middleware returns the view's response and writes nothing"""
+        response = HttpResponse()
+        middleware = ProfilingMiddleware(lambda request: response)
+        self.assertIs(middleware(self.factory.get('/')), response)
+        self.assertEqual(list(control.directory().iterdir()), [])
+
+    def test_url_name_selects_requests(self):
+        """Test that only the chosen view is profiled, into per-view report files"""
+        start(cpu=True, memory=True, url_name='sample:person_list', interval_ms=1)
+        self.middleware(self.factory.get(reverse('public:home')))
+        self.middleware(self.factory.get(reverse('sample:person_list')))
+
+        names = sorted(path.name for path in control.directory().iterdir())
+        self.assertEqual(
+            names,
+            [control.CONTROL_FILE, 'sample.person_list.allocations.txt', 'sample.person_list.collapsed'],
+        )
+        stacks = (control.directory() / 'sample.person_list.collapsed').read_text()
+        self.assertIn('project.profiling.tests:slow_view', stacks)
+        self.assertRegex(stacks.splitlines()[0], r'^\S.*;.* \d+$')
+        allocations = (control.directory() / 'sample.person_list.allocations.txt').read_text()
+        self.assertIn('GET /sample/people/ status=200', allocations)
+        self.assertIn('profiling/tests.py', allocations)
+
+    def test_async_requests_record_allocations_only(self):
+        """Test that under ASGI stacks are not sampled but allocations are recorded"""
+        async def async_view(request):
+            return slow_view(request)
+
+        start(cpu=True, memory=True, interval_ms=1)
+        middleware = ProfilingMiddleware(async_view)
+        async_to_sync(middleware)(self.factory.get(reverse('public:home')))
+
+        names = sorted(path.name for path in control.directory().iterdir())
+        self.assertEqual(names, [control.CONTROL_FILE, 'public.home.allocations.txt'])
+
+    def test_async_cpu_only_profiling_passes_through(self):
+        """Test that CPU-only profiling leaves ASGI requests alone"""
+        async def async_view(request):
+            return HttpResponse()
+
+        start(cpu=True, interval_ms=1)
+        async_to_sync(ProfilingMiddleware(async_view))(self.factory.get('/'))
+        self.assertEqual(
+            [path.name for path in control.directory().iterdir()], [control.CONTROL_FILE]
+        )
+
+    def test_fraction_samples_some_requests(self):
+        """Test that a fraction below one profiles only requests that win the draw"""
+        start(cpu=True, fraction=0.1, interval_ms=1)
+        report = control.directory() / 'public.home.collapsed'
+        with mock.patch('random.random', side_effect=[0.5, 0.05]):
+            self.middleware(self.factory.get(reverse('public:home')))
+            self.assertFalse(report.exists())
+            self.middleware(self.factory.get(reverse('public:home')))
+        self.assertTrue(report.exists())
+
+
+class StackSamplerTest(SimpleTestCase):
+    """Test cases for the background stack sampler"""
+
+    def test_samples_target_thread(self):
+        """Test that a busy thread's stacks are counted in collapsed form"""
+        sampler = StackSampler()
+        started = threading.Event()
+
+        def busy_loop():
+            started.set()
+            deadline = time.perf_counter() + 0.1
+            while time.perf_counter() < deadline:
+                pass
+
+        thread = threading.Thread(target=busy_loop)
+        thread.start()
+        started.wait()
+        sampler.add('capture', thread.ident, 0.002)
+        thread.join()
+        stacks = sampler.remove('capture')
+
+        self.assertTrue(any(stack.endswith('busy_loop') for stack in stacks), stacks)
+        self.assertTrue(all(stack.startswith('threading:') for stack in stacks))
+
+    def test_captures_on_one_thread_are_kept_apart(self):
+        """Test that a second capture on a thread neither replaces nor ends the first"""
+        sampler = StackSampler()
+        sampler.add('first', threading.get_ident(), 0.001)
+        sampler.add('second', threading.get_ident(), 0.001)
+        sampler.remove('second')
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        self.assertTrue(sampler.remove('first'))
+
+
+class ProfilingViewTest(TempDirSettingMixin, TestCase):
+    """Test cases for the admin-only profiling control page"""
+    temp_dir_setting = 'PROFILING_DIR'
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def test_requires_superuser(self):
+        """Test that anonymous and staff users are sent to the admin login"""
+        url = reverse('profiling:control')
+        self.assertRedirects(self.client.get(url), f"{reverse('admin:login')}?next={url}")
+        User.objects.create_user('staff', password='password', is_staff=True)
+        self.client.login(username='staff', password='password')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_start_stop_and_download(self):
+        """Test that the page starts and stops profiling and serves reports"""
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('profiling:control'), {
+            'cpu': 'on', 'fraction': '1', 'url_name': 'public:home', 'interval_ms': '1', 'minutes': '5',
+        }, follow=True)
+        self.assertContains(response, 'Profiling started.')
+        self.assertContains(response, '<code>public:home</code>')
+        self.assertTrue(control.current().active)
+
+        (control.directory() / 'public.home.collapsed').write_text('a;b 3\n')
+        response = self.client.get(reverse('profiling:control'))
+        self.assertContains(response, 'public.home.collapsed')
+        response = self.client.get(reverse('profiling:report', args=['public.home.collapsed']))
+        self.assertEqual(b''.join(response.streaming_content), b'a;b 3\n')
+        response = self.client.get(reverse('profiling:report', args=[control.CONTROL_FILE]))
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.post(reverse('profiling:control'), {'stop': ''}, follow=True)
+        self.assertContains(response, 'Profiling stopped.')
+        self.assertFalse(control.current().active)
+
+    def test_rejects_unknown_url_name(self):
+        """Test that the form only accepts URL names the project defines"""
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('profiling:control'), {
+            'memory': 'on', 'fraction': '1', 'url_name': 'sample:nope', 'interval_ms': '5', 'minutes': '5',
+        })
+        self.assertContains(response, 'There is no URL named')
+        self.assertFalse(control.current().active)
+
+
+@with_jinja2_pages
+class Jinja2ProfilingViewTest(ProfilingViewTest):
+    """Run the profiling page tests with the Jinja2 engine"""
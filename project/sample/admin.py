@@ -1,12 +1,82 @@
 from django.contrib import admin
-from .models import Person
+from django.core.exceptions import ValidationError
+from project.sharding import shards
+from .cache import person_cache
+from .models import ArchivedPerson, Person
 
 # Register your models here.
 
+class ShardListFilter(admin.SimpleListFilter):
+    """Narrow a sharded changelist to one shard; it reads every shard by default"""
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shards.shard_aliases()]
+
+    def queryset(self, request, queryset):
+        if self.value() in shards.shard_aliases():
+            return queryset.using(self.value())
+        return queryset
+
+
+class ShardedAdminMixin:
+    """Open change and delete pages on the shard encoded in the object's pk"""
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if shards.enabled():
+            return [ShardListFilter, *list_filter]
+        return list_filter
+
+    def get_object(self, request, object_id, from_field=None):
+        queryset = self.get_queryset(request).for_pk(object_id)
+        model = queryset.model
+        field = model._meta.pk if from_field is None else model._meta.get_field(from_field)
+        try:
+            object_id = field.to_python(object_id)
+            return queryset.get(**{field.name: object_id})
+        except (model.DoesNotExist, ValidationError, ValueError):
+            return None
+
+
 @admin.register(Person)
-class PersonAdmin(admin.ModelAdmin):
-    list_display = ['first_name', 'last_name', 'email', 'created_at']
+class PersonAdmin(ShardedAdminMixin, admin.ModelAdmin):
+    list_display = ['full_name', 'email', 'created_at']
     list_filter = ['created_at', 'updated_at']
-    search_fields = ['first_name', 'last_name', 'email']
+    search_fields = ['full_name', 'email']
+    search_help_text = 'Search by the start of a full name, or by an exact email address.'
     ordering = ['last_name', 'first_name']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['full_name', 'created_at', 'updated_at']
+
+    def get_object(self, request, object_id, from_field=None):
+        """Open change pages through the Person cache"""
+        if from_field is not None:
+            return super().get_object(request, object_id, from_field)
+        try:
+            return person_cache.get(object_id)
+        except (Person.DoesNotExist, ValidationError, ValueError):
+            return None
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match a full name prefix or an exact email through the functional
+        indexes only. The stock substring search scans the whole table, so
+        a last name alone or part of an email finds nobody.
+        """
+        if not search_term.strip():
+            return queryset, False
+        return queryset.search(search_term), False
+
+
+@admin.register(ArchivedPerson)
+class ArchivedPersonAdmin(ShardedAdminMixin, admin.ModelAdmin):
+    list_display = ['full_name', 'email', 'created_at', 'archived_at']
+    list_filter = ['archived_at']
+    ordering = ['last_name', 'first_name']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
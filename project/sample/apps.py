@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SampleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'project.sample'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,20 @@
+"""
+Sample app backfills
+"""
+from django.db.models.functions import Trim
+
+from project.backfill.base import Backfill, register
+from .models import Person
+
+
+@register
+class NormalizePersonNames(Backfill):
+    """Strip leading and trailing whitespace from first and last names"""
+    name = 'sample.normalize_person_names'
+    model = Person
+
+    def process_batch(self, queryset):
+        return queryset.exclude(
+            first_name=Trim('first_name'),
+            last_name=Trim('last_name'),
+        ).update(first_name=Trim('first_name'), last_name=Trim('last_name'))
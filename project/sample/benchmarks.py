@@ -0,0 +1,264 @@
+"""
+Sample app benchmarks
+
+Each benchmark is a function registered with ``@benchmark`` that receives a
+``BenchmarkRun`` and times its cases through ``run.measure()``. Run them with
+``python manage.py benchmark [name ...]``; they execute against a throwaway
+test database, never the configured one.
+"""
+import itertools
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management import call_command
+from django.db import connections
+from django.db.models import Value
+from django.db.models.functions import Concat
+from django.test import Client, RequestFactory, override_settings
+from django.http import HttpResponse
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from project.metrics.middleware import MetricsMiddleware
+from project.profiling.middleware import ProfilingMiddleware
+from web.sample.forms import PersonForm
+from .cache import person_cache
+from .models import Person
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    """Register a benchmark under its function name"""
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+class BenchmarkRun:
+    """Parameters and collected results for a single benchmark invocation"""
+
+    def __init__(self, rows, repeat):
+        self.rows = rows
+        self.repeat = repeat
+        self.results = []
+        self.skipped = None
+
+    def skip(self, reason):
+        """Record why this benchmark cannot run in the current settings"""
+        self.skipped = reason
+
+    def measure(self, label, func):
+        """Call func `repeat` times and record per-call timings in milliseconds"""
+        func()  # warm caches and connections
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        result = {
+            'label': label,
+            'median_ms': statistics.median(timings),
+            'min_ms': min(timings),
+            'max_ms': max(timings),
+        }
+        self.results.append(result)
+        return result
+
+
+def make_people(count, prefix='bench'):
+    """Bulk insert `count` people with distinct names and emails"""
+    Person.objects.bulk_create(
+        [
+            Person(
+                first_name=f'First{i:07d}',
+                last_name=f'Last{i % 997:04d}',
+                email=f'{prefix}.{i}@example.com',
+            )
+            for i in range(count)
+        ],
+        batch_size=1000,
+    )
+
+
+@benchmark
+def person_lookups(run):
+    """Case-insensitive email and name-prefix lookups: LIKE scans vs index seeks"""
+    make_people(run.rows)
+    email = f'BENCH.{run.rows // 2}@Example.com'
+    prefix = f'first{run.rows // 2:07d}'
+
+    run.measure(
+        'email iexact (scan)',
+        lambda: list(Person.objects.filter(email__iexact=email)),
+    )
+    run.measure(
+        'email with_email (index)',
+        lambda: list(Person.objects.with_email(email)),
+    )
+    run.measure(
+        'name istartswith on Concat (scan)',
+        lambda: list(
+            Person.objects.annotate(
+                name=Concat('first_name', Value(' '), 'last_name')
+            ).filter(name__istartswith=prefix)
+        ),
+    )
+    run.measure(
+        'name_startswith (index)',
+        lambda: list(Person.objects.name_startswith(prefix)),
+    )
+
+
+@benchmark
+def person_cache_paths(run):
+    """Lookups by pk and the writes that retire them, with the Person cache on and off"""
+    make_people(run.rows)
+    pk = Person.objects.order_by('pk').values_list('pk', flat=True)[run.rows // 2]
+    person = Person.objects.get(pk=pk)
+    batch = Person.objects.filter(pk__in=Person.objects.order_by('pk').values('pk')[:1000])
+    alias = settings.PERSON_CACHE_ALIAS
+    backends = (
+        ('cache on', settings.CACHES[alias]),
+        ('cache off', {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}),
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, backend in backends:
+            caches_setting = {**settings.CACHES, alias: {**backend, 'LOCATION': directory}}
+            with override_settings(CACHES=caches_setting):
+                # A full shared tier, since the file cache's writes slow down as it fills.
+                for other in Person.objects.values_list('pk', flat=True):
+                    person_cache.get(other)
+                run.measure(f'{name}: get by pk', lambda: person_cache.get(pk))
+                run.measure(f'{name}: save one row', lambda: person.save())
+                run.measure(f'{name}: update {batch.count()} rows', lambda: batch.update(last_name='Cached'))
+
+
+def make_engine(name, config):
+    """Build a template backend from one of the TEMPLATES entries in settings"""
+    params = dict(config, NAME=name)
+    return import_string(params.pop('BACKEND'))(params)
+
+
+@benchmark
+def person_list_render(run):
+    """Rendering a person_list page of `rows` cards on each template engine"""
+    make_people(run.rows)
+    people = list(Person.objects.all())
+    request = RequestFactory().get('/sample/people/')
+    request.user = AnonymousUser()
+    context = {'people': people, 'query': ''}
+
+    engines = [('django', settings.DJANGO_TEMPLATES)]
+    try:
+        import jinja2  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        engines.append(('jinja2', settings.JINJA2_TEMPLATES))
+
+    for name, config in engines:
+        template = make_engine(name, config).get_template('sample/person_list.html')
+        run.measure(f'{name} person_list', lambda: template.render(context, request))
+
+
+@benchmark
+def archive_hot_path(run):
+    """person_list, admin changelist and email checks before and after archiving 90%"""
+    make_people(run.rows)
+    cutoff = Person.objects.order_by('pk').values_list('pk', flat=True)[run.rows * 9 // 10]
+    Person.objects.filter(pk__lt=cutoff).update(created_at=timezone.now() - timedelta(days=400))
+
+    client = Client()
+    client.force_login(User.objects.create_superuser('bench', 'bench@example.com', 'bench'))
+    list_url = reverse('sample:person_list')
+    changelist_url = reverse('admin:sample_person_changelist')
+    form_data = {'first_name': 'New', 'last_name': 'Person', 'email': 'new.person@example.com'}
+
+    def measure_all(phase):
+        run.measure(f'{phase}: person_list', lambda: client.get(list_url))
+        run.measure(f'{phase}: admin changelist', lambda: client.get(changelist_url))
+        run.measure(f'{phase}: PersonForm email check', lambda: PersonForm(data=form_data).is_valid())
+
+    measure_all('all hot')
+    call_command('archive_people', older_than_days=365, batch_size=1000, stdout=StringIO())
+    measure_all('90% archived')
+
+
+def _insert_people(first, count):
+    """Worker process body for sharded_writes"""
+    for i in range(first, first + count):
+        Person.objects.create(first_name=f'First{i}', last_name='Writer', email=f'writer.{i}@example.com')
+    connections.close_all()
+
+
+@benchmark
+def sharded_writes(run):
+    """Concurrent Person inserts from 8 worker processes on 1, 2 and 3 SQLite shard files"""
+    aliases = ['shard1', 'shard2', 'shard3']
+    if not set(aliases) <= set(settings.DATABASES):
+        return run.skip('needs the spare shard databases; run with --settings config.settings_test')
+    workers, burst = 8, 400
+    serial = itertools.count(step=burst)
+    fork = multiprocessing.get_context('fork')
+
+    def insert_burst():
+        first = next(serial)
+        # Children must open their own connections; id blocks reset themselves at fork.
+        connections.close_all()
+        per_worker = burst // workers
+        processes = [
+            fork.Process(target=_insert_people, args=(first + n * per_worker, per_worker))
+            for n in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            if process.exitcode:
+                raise RuntimeError(f'Writer process failed with exit code {process.exitcode}')
+
+    for count in (1, 2, 3):
+        with override_settings(PERSON_SHARDS=aliases[:count]):
+            result = run.measure(f'{count} shard(s): {burst} inserts', insert_burst)
+        result['label'] += f', {burst / result["median_ms"] * 1000:,.0f}/s on {os.cpu_count()} CPU(s)'
+
+
+@benchmark
+def middleware_overhead(run):
+    """Per-request cost of the metrics and idle profiling middleware over a bare view"""
+    Person.objects.create(first_name='Jane', last_name='Smith', email='jane.smith@example.com')
+    calls = 1000
+    request = RequestFactory().get(reverse('sample:person_list'))
+    request.resolver_match = resolve(request.path)
+    response = HttpResponse(b'x' * 2048)
+
+    def empty_view(request):
+        return response
+
+    def query_view(request):
+        Person.objects.filter(pk__gt=0).exists()
+        return response
+
+    def batch(handler):
+        def call():
+            for _ in range(calls):
+                handler(request)
+        return call
+
+    with tempfile.TemporaryDirectory() as directory, \
+            override_settings(METRICS_DIR=directory, PROFILING_DIR=directory):
+        for view, name in ((empty_view, 'no queries'), (query_view, '1 query')):
+            bare = run.measure(f'bare view, {name} (x{calls})', batch(view))
+            for middleware in (MetricsMiddleware, ProfilingMiddleware):
+                result = run.measure(f'{middleware.__name__}, {name} (x{calls})', batch(middleware(view)))
+                overhead_us = (result['median_ms'] - bare['median_ms']) * 1000 / calls
+                result['label'] += f', +{overhead_us:.2f} us/request'
@@ -0,0 +1,311 @@
+"""
+Versioned read-through cache for Person rows looked up by primary key
+
+Two tiers sit in front of the database: a bounded LRU in each process and
+the shared Django cache backend. Each pk has a version in the shared cache,
+and so does the whole cache (its generation). Entries are stored under
+``<pk>:<generation>.<version>``, so replacing either one retires all older
+copies in both tiers at once.
+
+Versions are replaced once, when the writing transaction commits; until
+then the writer's own thread reads the rows it wrote from the database.
+A replacement is a fresh random token rather than an increment, so two
+processes bumping the same pk at once cannot lose a bump, even on backends
+without an atomic ``incr()``. A batch of more than MAX_VERSION_BUMPS rows
+replaces the generation instead, one write however many rows changed.
+
+Entries are compact JSON arrays of the row's column values, not pickled
+model instances; readers rebuild instances with ``Model.from_db()``.
+
+Versions only retire entries everywhere if every worker process sees the
+same shared tier. When PERSON_CACHE_ALIAS names a process-local backend
+(LocMemCache or DummyCache) the cache is off and lookups go straight to
+the database.
+"""
+import hashlib
+import json
+import secrets
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from project.metrics.metrics import Counter, Histogram
+from project.sharding.shards import db_for_pk
+
+# Backends whose contents other worker processes cannot see.
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+# Larger write batches retire the whole cache rather than one key per row.
+MAX_VERSION_BUMPS = 20
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+cache_lookups = Counter(
+    'django_person_cache_lookups',
+    'Person cache lookups by result: local, shared or miss.',
+    ('result',),
+)
+cache_queries_saved = Histogram(
+    'django_person_cache_queries_saved',
+    'Database queries the Person cache saved per request.',
+    (),
+    buckets=(0, 1, 2, 3, 5, 10, 20),
+)
+
+
+class CacheStats:
+    """Lookup counts for one request, or for the process"""
+
+    def __init__(self):
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def as_dict(self):
+        hits = self.local_hits + self.shared_hits
+        lookups = hits + self.misses
+        return {
+            'lookups': lookups,
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            # Every hit is a SELECT by pk that did not run.
+            'queries_saved': hits,
+        }
+
+
+_request_stats = ContextVar('person_cache_request_stats', default=None)
+
+
+def start_request():
+    """Begin counting lookups for a new request"""
+    _request_stats.set(CacheStats())
+
+
+def finish_request():
+    """Record the finished request's savings in the shared metrics"""
+    stats = _request_stats.get()
+    if stats is not None:
+        cache_queries_saved.observe((), stats.local_hits + stats.shared_hits)
+        _request_stats.set(None)
+
+
+def request_stats():
+    """Hit ratio and queries saved so far in the current request"""
+    return (_request_stats.get() or CacheStats()).as_dict()
+
+
+class LocalLRU:
+    """Thread-safe, size-bounded mapping that evicts the least recently used key"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+
+class PersonCache:
+    """
+    Read-through cache of Person rows by pk.
+
+    ``get()`` raises Person.DoesNotExist like ``QuerySet.get()``; missing
+    rows are not cached. Every code path that writes Person rows, bulk
+    updates and deletes included, calls ``invalidate()``.
+    """
+
+    def __init__(self):
+        self.totals = CacheStats()
+        self._local = None
+        self._prefix = None
+        self._enabled = None
+        # Per thread, like database connections: alias -> pks written in its open transaction.
+        self._written = threading.local()
+
+    @property
+    def enabled(self):
+        """False when the shared tier is not shared between processes"""
+        if self._enabled is None:
+            self._enabled = not isinstance(self.shared, PROCESS_LOCAL_BACKENDS)
+        return self._enabled
+
+    @property
+    def model(self):
+        return apps.get_model('sample', 'Person')
+
+    @property
+    def shared(self):
+        return caches[settings.PERSON_CACHE_ALIAS]
+
+    @property
+    def local(self):
+        if self._local is None:
+            self._local = LocalLRU(settings.PERSON_CACHE_LOCAL_SIZE)
+        return self._local
+
+    def fields(self):
+        return self.model._meta.concrete_fields
+
+    def key_prefix(self):
+        if self._prefix is None:
+            # The column list is part of the key, so a schema change never reads old rows.
+            columns = ','.join(field.attname for field in self.fields())
+            digest = hashlib.blake2b(columns.encode(), digest_size=4).hexdigest()
+            self._prefix = f'person:{digest}'
+        return self._prefix
+
+    def get(self, pk):
+        """The Person with `pk`, from the local tier, the shared tier or the database"""
+        pk = self.model._meta.pk.to_python(pk)
+        alias = db_for_pk(pk)
+        if not self.enabled or self._written_here(alias or DEFAULT_DB_ALIAS, pk):
+            return self.model._base_manager.using(alias).get(pk=pk)
+        # One shared-cache read per lookup: the version decides whether either tier is current.
+        version = self.version(pk)
+        entry = self.local.get(pk)
+        if entry is not None and entry[0] == version:
+            self._count('local')
+            return self.build(pk, entry[1])
+
+        key = f'{self.key_prefix()}:{pk}:{version}'
+        row = self.shared.get(key)
+        if row is not None:
+            self._count('shared')
+            values = self.decode(row)
+        else:
+            self._count('miss')
+            instance = self.model._base_manager.using(alias).get(pk=pk)
+            values = [getattr(instance, field.attname) for field in self.fields()]
+            self.shared.set(key, self.encode(values), settings.PERSON_CACHE_TIMEOUT)
+        self.local.set(pk, (version, values))
+        return self.build(pk, values)
+
+    def version(self, pk):
+        """The generation and the version of `pk`, as one token"""
+        keys = [self._generation_key(), self._version_key(pk)]
+        tokens = self.shared.get_many(keys)
+        if len(tokens) < len(keys):
+            # Start missing keys from a fresh token, not a counter, so an evicted
+            # key cannot bring back entries written under an earlier one.
+            for key in keys:
+                if key not in tokens:
+                    self.shared.add(key, secrets.token_hex(8), None)
+            tokens = self.shared.get_many(keys)
+        return '.'.join(str(tokens.get(key, '')) for key in keys)
+
+    def invalidate(self, pks, using=None):
+        """
+        Retire cached copies of `pks` once `using` commits.
+
+        Until then this thread reads those rows from the database, so the
+        transaction sees its own writes and nothing caches a row that may
+        still roll back.
+        """
+        pks = [pk for pk in pks if pk is not None]
+        if not pks or not self.enabled:
+            return
+        using = using or DEFAULT_DB_ALIAS
+        if connections[using].in_atomic_block:
+            vars(self._written).setdefault(using, set()).update(pks)
+        transaction.on_commit(lambda: self._bump(pks, using), using=using)
+
+    def _bump(self, pks, using):
+        if len(pks) > MAX_VERSION_BUMPS:
+            self.shared.set(self._generation_key(), secrets.token_hex(8), None)
+        else:
+            self.shared.set_many({self._version_key(pk): secrets.token_hex(8) for pk in pks}, None)
+        vars(self._written).get(using, set()).difference_update(pks)
+
+    def _written_here(self, alias, pk):
+        """Whether this thread's open transaction on `alias` wrote `pk`"""
+        written = vars(self._written).get(alias)
+        if not written:
+            return False
+        if not connections[alias].in_atomic_block:
+            # The transaction ended; on rollback no commit hook cleared these.
+            written.clear()
+            return False
+        return pk in written
+
+    def _generation_key(self):
+        return f'{self.key_prefix()}:generation'
+
+    def _version_key(self, pk):
+        return f'{self.key_prefix()}:{pk}:version'
+
+    def encode(self, values):
+        """A compact JSON array of column values; datetimes as epoch microseconds"""
+        values = [
+            (value.replace(tzinfo=value.tzinfo or dt_timezone.utc) - EPOCH) // MICROSECOND
+            if isinstance(value, datetime) else value
+            for value in values
+        ]
+        return json.dumps(values, separators=(',', ':'))
+
+    def decode(self, row):
+        values = json.loads(row)
+        for index, field in enumerate(self.fields()):
+            if field.get_internal_type() == 'DateTimeField' and values[index] is not None:
+                value = EPOCH + values[index] * MICROSECOND
+                values[index] = value if settings.USE_TZ else value.replace(tzinfo=None)
+        return values
+
+    def build(self, pk, values):
+        """A fresh instance per lookup, so callers can't change each other's copies"""
+        field_names = [field.attname for field in self.fields()]
+        return self.model.from_db(db_for_pk(pk) or 'default', field_names, list(values))
+
+    def stats(self):
+        """Hit ratio and queries saved by this process since it started"""
+        return self.totals.as_dict()
+
+    def reset(self):
+        """Drop the local tier and re-read the settings; the shared tier is left alone"""
+        self._local = None
+        self._prefix = None
+        self._enabled = None
+
+    def _count(self, result):
+        request = _request_stats.get()
+        for stats in (self.totals, request) if request is not None else (self.totals,):
+            if result == 'local':
+                stats.local_hits += 1
+            elif result == 'shared':
+                stats.shared_hits += 1
+            else:
+                stats.misses += 1
+        cache_lookups.inc((result,))
+
+
+person_cache = PersonCache()
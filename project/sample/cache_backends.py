@@ -0,0 +1,26 @@
+"""
+Cache backends for the Person cache's shared tier
+"""
+import random
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class SampledCullFileCache(FileBasedCache):
+    """
+    FileBasedCache that checks its size on one write in CULL_EVERY.
+
+    The stock backend lists its whole directory before every write to decide
+    whether to cull, so writes get slower as the cache fills. Sampling keeps
+    that cost off most writes; the cache can overshoot MAX_ENTRIES by about
+    CULL_EVERY entries before a check trims it.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._cull_every = int(params.get('OPTIONS', {}).get('CULL_EVERY', 100))
+
+    def _cull(self):
+        # Sampled rather than counted, so separate processes need no shared state.
+        if random.random() * self._cull_every < 1:
+            super()._cull()
@@ -0,0 +1,82 @@
+"""
+Management command to move old people into the archive table
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from project.sample.models import Person
+from project.sharding.shards import scatter
+
+
+class Command(BaseCommand):
+    help = 'Move people created before a cutoff into the archive, in batched transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            help='Archive people created more than this many days ago',
+        )
+        parser.add_argument(
+            '--before',
+            help='Archive people created before this ISO date/time',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows moved per transaction (default: 500)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many people would be archived without moving them',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = self.get_cutoff(options)
+        old_people = Person.objects.filter(created_at__lt=cutoff)
+
+        if options['dry_run']:
+            count = sum(shard_people.count() for shard_people in scatter(old_people))
+            self.stdout.write(f'Would archive {count} people created before {cutoff}')
+            return
+
+        archived = skipped = 0
+        for shard_people in scatter(old_people):
+            # Walk by pk, so rows archive() leaves in place are not picked again.
+            last_pk = 0
+            while True:
+                batch = list(
+                    shard_people.filter(pk__gt=last_pk).order_by('pk')
+                    .values_list('pk', flat=True)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1]
+                moved = shard_people.filter(pk__in=batch).archive()
+                archived += moved
+                skipped += len(batch) - moved
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Archived {archived} people so far')
+
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f'Left {skipped} people in place: their email is already archived'
+            ))
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} people created before {cutoff}'))
+
+    def get_cutoff(self, options):
+        if (options['older_than_days'] is None) == (options['before'] is None):
+            raise CommandError('Give exactly one of --older-than-days or --before.')
+        if options['older_than_days'] is not None:
+            return timezone.now() - timedelta(days=options['older_than_days'])
+
+        cutoff = parse_datetime(options['before'])
+        if cutoff is None:
+            raise CommandError(f'Invalid date/time: {options["before"]}')
+        if timezone.is_naive(cutoff):
+            cutoff = timezone.make_aware(cutoff)
+        return cutoff
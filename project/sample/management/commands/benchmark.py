@@ -0,0 +1,66 @@
+"""
+Management command to run the sample app benchmarks
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from project.sample.benchmarks import BENCHMARKS, BenchmarkRun
+
+
+class Command(BaseCommand):
+    help = 'Run sample app benchmarks against a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help=f'Benchmarks to run (default: all). Available: {", ".join(BENCHMARKS)}',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=10000,
+            help='Number of rows to populate (default: 10000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Timed repetitions per case (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f'Unknown benchmark(s): {", ".join(unknown)}')
+
+        setup_test_environment()
+        try:
+            for name in names:
+                self.run_benchmark(name, options)
+        finally:
+            teardown_test_environment()
+
+    def run_benchmark(self, name, options):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            run = BenchmarkRun(rows=options['rows'], repeat=options['repeat'])
+            BENCHMARKS[name](run)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        if run.skipped:
+            self.stdout.write(self.style.WARNING(f'{name} skipped: {run.skipped}'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'{name} ({run.rows} rows, {run.repeat} runs)'))
+        for result in run.results:
+            self.stdout.write(
+                f'  {result["label"]:<40} median {result["median_ms"]:9.3f} ms'
+                f'  min {result["min_ms"]:9.3f} ms  max {result["max_ms"]:9.3f} ms'
+            )
@@ -2,7 +2,7 @@
 Management command to create sample data for testing
 """
 from django.core.management.base import BaseCommand, CommandError
-from project.sample.models import Person
+from project.sample.models import ArchivedPerson, Person
 
 
 class Command(BaseCommand):
@@ -48,8 +48,12 @@ class Command(BaseCommand):
         for i in range(min(count, len(sample_people))):
             first_name, last_name, email = sample_people[i]
             
-            # Check if person already exists
-            if not Person.objects.filter(email=email).exists():
+            # Check if person already exists, hot or archived
+            exists = (
+                Person.objects.with_email(email).exists()
+                or ArchivedPerson.objects.with_email(email).exists()
+            )
+            if not exists:
                 Person.objects.create(
                     first_name=first_name,
                     last_name=last_name,
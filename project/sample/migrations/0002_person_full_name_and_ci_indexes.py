@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:25
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sample', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='full_name',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Concat('first_name', models.Value(' '), 'last_name'), output_field=models.CharField(max_length=201)),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['last_name', 'first_name'], name='sample_person_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(django.db.models.functions.text.Lower('full_name'), name='sample_person_full_name_ci_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='sample_person_email_ci_idx'),
+        ),
+    ]
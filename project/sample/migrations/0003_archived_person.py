@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:36
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sample', '0002_person_full_name_and_ci_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email_hash', models.BigIntegerField(db_index=True)),
+                ('person_id', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Archived email',
+                'verbose_name_plural': 'Archived emails',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPerson',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('full_name', models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Concat('first_name', models.Value(' '), 'last_name'), output_field=models.CharField(max_length=201))),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archived person',
+                'verbose_name_plural': 'Archived people',
+                'ordering': ['last_name', 'first_name'],
+            },
+        ),
+    ]
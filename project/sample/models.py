@@ -1,23 +1,403 @@
-from django.db import models
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Concat, Lower
+from project.outbox.models import OutboxEvent
+from project.outbox.publish import publish, publish_deleted, publish_many
+from project.sharding import shards
+from .cache import person_cache
 
 # Create your models here.
 
+# Rows per statement in bulk update() and delete(), well under SQLite's
+# limit on query parameters.
+WRITE_CHUNK_SIZE = 500
+
+def lowered(value):
+    """
+    `value` lowered by the database, so it matches a Lower() index.
+
+    Lowering in Python instead would disagree with backends whose LOWER()
+    only folds ASCII, such as SQLite.
+    """
+    return Lower(Value(value, output_field=models.CharField()))
+
+
+def lowered_prefix_range(prefix):
+    """Bounds for a range seek on lowered values starting with `prefix`"""
+    low = lowered(prefix)
+    return low, Concat(low, Value('\U0010ffff'), output_field=models.CharField())
+
+
+class PersonQuerySet(shards.ScatterReadsMixin, models.QuerySet):
+    """
+    Lookups that resolve through the Person functional indexes.
+
+    Bulk writes are overridden so they record outbox events in the same
+    transaction as the rows they change. When sharding is on, querysets not
+    pinned to a database with ``using()`` read from and fan bulk writes out
+    to every shard.
+    """
+
+    def for_pk(self, pk):
+        """Pin this queryset to the shard holding `pk`"""
+        return self if self._db else self.using(shards.db_for_pk(pk))
+
+    def with_email(self, email):
+        """Case-insensitive exact match on email, served by the Lower(email) index"""
+        queryset = self if self._db else self.using(shards.db_for_email(email))
+        return queryset.alias(email_lower=Lower('email')).filter(email_lower=lowered(email))
+
+    def name_startswith(self, prefix):
+        """Case-insensitive full name prefix match as a range seek on Lower(full_name)"""
+        low, high = lowered_prefix_range(prefix)
+        return self.alias(full_name_lower=Lower('full_name')).filter(
+            full_name_lower__gte=low,
+            full_name_lower__lt=high,
+        )
+
+    def search(self, term):
+        """Match a full name prefix or an exact email, both through indexes"""
+        term = term.strip()
+        low, high = lowered_prefix_range(term)
+        return self.alias(
+            full_name_lower=Lower('full_name'),
+            email_lower=Lower('email'),
+        ).filter(
+            Q(full_name_lower__gte=low, full_name_lower__lt=high)
+            | Q(email_lower=lowered(term))
+        )
+
+    def create(self, **kwargs):
+        if shards.enabled() and not self._db and kwargs.get('email'):
+            return self.using(shards.shard_for_email(kwargs['email'])).create(**kwargs)
+        return super().create(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if shards.enabled() and not self._db:
+            objs = list(objs)
+            by_shard = {}
+            for obj in objs:
+                by_shard.setdefault(shards.shard_for_email(obj.email), []).append(obj)
+            for alias, group in by_shard.items():
+                new = [obj for obj in group if obj.pk is None]
+                ids = shards.allocate_ids(alias, self.model._meta.label_lower, len(new))
+                for obj, pk in zip(new, ids):
+                    obj.pk = pk
+                self.using(alias).bulk_create(group, *args, **kwargs)
+            return objs
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            check_not_archived([obj.email for obj in objs], using=self.db)
+            publish_many(objs, OutboxEvent.CREATED, using=self.db)
+            person_cache.invalidate([obj.pk for obj in objs], using=self.db)
+        return objs
+
+    def update(self, **kwargs):
+        if len(parts := shards.scatter(self)) > 1:
+            return sum(part.update(**kwargs) for part in parts)
+        rows = 0
+        with transaction.atomic(using=self.db):
+            for pks in self._locked_pk_chunks():
+                # Update exactly the locked rows, so rows that start matching
+                # concurrently are not changed without an event.
+                changed = self.model._base_manager.using(self.db).filter(pk__in=pks)
+                rows += models.QuerySet.update(changed, **kwargs)
+                publish_many(changed, OutboxEvent.UPDATED, using=self.db)
+                person_cache.invalidate(pks, using=self.db)
+            if rows and isinstance(kwargs.get('email'), str):
+                check_not_archived([kwargs['email']], using=self.db)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        if len(parts := shards.scatter(self)) > 1:
+            total, per_model = 0, {}
+            for part in parts:
+                deleted, counts = part.delete()
+                total += deleted
+                for label, count in counts.items():
+                    per_model[label] = per_model.get(label, 0) + count
+            return total, per_model
+        total, per_model = 0, {}
+        with transaction.atomic(using=self.db):
+            for pks in self._locked_pk_chunks():
+                deleted, counts = models.QuerySet.delete(
+                    self.model._base_manager.using(self.db).filter(pk__in=pks)
+                )
+                total += deleted
+                for label, count in counts.items():
+                    per_model[label] = per_model.get(label, 0) + count
+                publish_deleted(self.model, pks, using=self.db)
+                person_cache.invalidate(pks, using=self.db)
+        return total, per_model
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def _locked_pk_chunks(self):
+        """
+        Lock the matching rows and yield their pks, WRITE_CHUNK_SIZE at a time.
+
+        Only rows up to the highest pk matching at the start are visited, so
+        rows created while the chunks are written are left alone.
+        """
+        locked = self.select_for_update().order_by('pk').values_list('pk', flat=True)
+        last = locked.order_by('-pk').first()
+        if last is None:
+            return
+        locked = locked.filter(pk__lte=last)
+        pks = list(locked[:WRITE_CHUNK_SIZE])
+        while pks:
+            yield pks
+            pks = list(locked.filter(pk__gt=pks[-1])[:WRITE_CHUNK_SIZE])
+
+    def archive(self):
+        """
+        Move these rows to ArchivedPerson in one transaction; return how many moved.
+
+        A row whose email is already archived, which only rows written before
+        the write path checked the archive can have, stays hot instead of
+        failing the whole batch on the archive's unique email.
+        """
+        with transaction.atomic(using=self.db):
+            people = list(self)
+            hot = self.model._base_manager.using(self.db).filter(pk__in=[person.pk for person in people])
+            archived = ArchivedPerson.objects.using(self.db).with_emails([person.email for person in people])
+            colliding = set(
+                hot.alias(email_lower=Lower('email'))
+                .filter(email_lower__in=archived.annotate(email_lower=Lower('email')).values('email_lower'))
+                .values_list('pk', flat=True)
+            )
+            people = [person for person in people if person.pk not in colliding]
+            if not people:
+                return 0
+            ArchivedPerson.objects.using(self.db).bulk_create(
+                [ArchivedPerson.from_person(person) for person in people]
+            )
+            ArchivedEmail.objects.using(self.db).bulk_create([
+                ArchivedEmail(email_hash=email_hash(person.email), person_id=person.pk)
+                for person in people
+            ])
+            pks = [person.pk for person in people]
+            # Skip our delete() override: consumers get 'archived' events, not 'deleted'.
+            models.QuerySet.delete(self.model._base_manager.using(self.db).filter(pk__in=pks))
+            publish_deleted(self.model, pks, using=self.db, action=OutboxEvent.ARCHIVED)
+            person_cache.invalidate(pks, using=self.db)
+        return len(people)
+
+    archive.alters_data = True
+    archive.queryset_only = True
+
+
 class Person(models.Model):
     """Sample Person model"""
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
+    full_name = models.GeneratedField(
+        expression=Concat('first_name', Value(' '), 'last_name'),
+        output_field=models.CharField(max_length=201),
+        db_persist=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PersonQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Person"
         verbose_name_plural = "People"
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['last_name', 'first_name'], name='sample_person_name_idx'),
+            models.Index(Lower('full_name'), name='sample_person_full_name_ci_idx'),
+            models.Index(Lower('email'), name='sample_person_email_ci_idx'),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
-    
-    @property
-    def full_name(self):
+
+    is_archived = False
+
+    def validate_unique(self, exclude=None):
+        exclude = set(exclude or ())
+        check_email = self.email and 'email' not in exclude
+        if check_email and shards.enabled():
+            # The stock check queries one database; ask the email's own shard instead.
+            exclude.add('email')
+            hot = Person.objects.with_email(self.email)
+            if not self._state.adding:
+                hot = hot.exclude(pk=self.pk)
+            if hot.exists():
+                raise ValidationError({'email': "A person with this email already exists."})
+        super().validate_unique(exclude=exclude)
+        if check_email:
+            if ArchivedPerson.objects.with_email(self.email).exists():
+                raise ValidationError({'email': "A person with this email already exists."})
+
+    def save(self, *args, **kwargs):
+        if shards.enabled():
+            target = kwargs.get('using') or shards.shard_for_email(self.email)
+            if self._state.adding and self.pk is None:
+                # The id records the shard, so later lookups by pk go straight there.
+                self.pk = shards.allocate_id(target, self._meta.label_lower)
+                kwargs['using'] = target
+            elif not self._state.adding and shards.shard_for_pk(self.pk) != target:
+                return self._move_to_shard(target)
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        created = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        pk = self.pk
+        try:
+            with transaction.atomic(using=using):
+                super().save(*args, **kwargs)
+                if update_fields is None or 'email' in update_fields:
+                    check_not_archived([self.email], using=using)
+                # The database computes full_name; mirror it so callers don't need a refresh.
+                self.full_name = str(self)
+                publish(self, OutboxEvent.CREATED if created else OutboxEvent.UPDATED, using=using)
+                person_cache.invalidate([self.pk], using=using)
+        except IntegrityError:
+            # The row was rolled back; leave the instance unsaved so a retry inserts it.
+            self.pk, self._state.adding = pk, created
+            raise
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            publish(self, OutboxEvent.DELETED, using=using)
+            person_cache.invalidate([self.pk], using=using)
+            return super().delete(*args, **kwargs)
+
+    def _move_to_shard(self, target):
+        """
+        Re-home a person whose new email hashes to another shard.
+
+        The row gets a new pk on the target shard. The insert commits before
+        the old row is deleted, so a crash in between leaves a stale copy
+        under the old email rather than losing the person.
+        """
+        source, old_pk = self._state.db, self.pk
+        self.pk = shards.allocate_id(target, self._meta.label_lower)
+        self._state.adding = True
+        self._state.db = None
+        self.save(using=target, force_insert=True)
+        with transaction.atomic(using=source):
+            models.QuerySet.delete(Person._base_manager.using(source).filter(pk=old_pk))
+            publish_deleted(Person, [old_pk], using=source)
+            person_cache.invalidate([old_pk], using=source)
+
+    def outbox_payload(self):
+        return {
+            'id': self.pk,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'email': self.email,
+            'full_name': str(self),
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+        }
+
+
+def check_not_archived(emails, using=None):
+    """
+    Raise IntegrityError if any of `emails` belongs to an archived person.
+
+    The archive has its own unique email, so the database cannot enforce
+    uniqueness across hot and cold rows; every Person write path calls this.
+    Callers check inside their transaction, after their own write, so the
+    check and the write commit together. By then the write holds SQLite's
+    database lock, and on other databases the hot email's unique index makes
+    a concurrent archive of the same email commit first, so the check sees
+    it. Checking before the write would also make SQLite upgrade a read
+    lock, which fails at once under concurrent writers instead of waiting.
+    """
+    emails = [email for email in emails if email]
+    if emails and ArchivedPerson.objects.using(using).with_emails(emails).exists():
+        raise IntegrityError("A person with this email is already archived.")
+
+
+def email_hash(email):
+    """Signed 64-bit digest of a case-folded email for the compact archive index"""
+    digest = hashlib.blake2b(email.lower().encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class ArchivedPersonQuerySet(shards.ScatterReadsMixin, models.QuerySet):
+    """Lookups for cold rows, read from every shard unless pinned"""
+
+    def for_pk(self, pk):
+        """Pin this queryset to the shard holding `pk`"""
+        return self if self._db else self.using(shards.db_for_pk(pk))
+
+    def with_email(self, email):
+        """Case-insensitive email match, narrowed through the ArchivedEmail hash index"""
+        queryset = self if self._db else self.using(shards.db_for_email(email))
+        candidates = ArchivedEmail.objects.filter(email_hash=email_hash(email)).values('person_id')
+        return queryset.filter(pk__in=candidates).alias(email_lower=Lower('email')).filter(
+            email_lower=lowered(email)
+        )
+
+    def with_emails(self, emails):
+        """Archived rows matching any of `emails`, case-insensitively, for batch checks"""
+        emails = list(emails)
+        candidates = ArchivedEmail.objects.filter(
+            email_hash__in=[email_hash(email) for email in emails]
+        ).values('person_id')
+        return self.filter(pk__in=candidates).alias(email_lower=Lower('email')).filter(
+            email_lower__in=[lowered(email) for email in emails]
+        )
+
+
+class ArchivedPerson(models.Model):
+    """Cold copy of a Person row, moved here by the archive_people command"""
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID')
+    first_name = models.CharField(max_length=100)
+    last_name = models.CharField(max_length=100)
+    email = models.EmailField(unique=True)
+    full_name = models.GeneratedField(
+        expression=Concat('first_name', Value(' '), 'last_name'),
+        output_field=models.CharField(max_length=201),
+        db_persist=True,
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ArchivedPersonQuerySet.as_manager()
+
+    is_archived = True
+
+    class Meta:
+        verbose_name = "Archived person"
+        verbose_name_plural = "Archived people"
+        ordering = ['last_name', 'first_name']
+
+    def __str__(self):
         return f"{self.first_name} {self.last_name}"
+
+    @classmethod
+    def from_person(cls, person):
+        return cls(
+            id=person.pk,
+            first_name=person.first_name,
+            last_name=person.last_name,
+            email=person.email,
+            created_at=person.created_at,
+            updated_at=person.updated_at,
+        )
+
+
+class ArchivedEmail(models.Model):
+    """Hash of each archived email, so hot-path uniqueness checks stay small"""
+    email_hash = models.BigIntegerField(db_index=True)
+    person_id = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = "Archived email"
+        verbose_name_plural = "Archived emails"
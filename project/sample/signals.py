@@ -0,0 +1,26 @@
+"""
+Sample app signal handlers
+"""
+from django.core.signals import request_finished, request_started, setting_changed
+from django.dispatch import receiver
+
+from . import cache
+
+
+@receiver(request_started)
+def start_person_cache_stats(**kwargs):
+    """Count Person cache lookups per request"""
+    cache.start_request()
+
+
+@receiver(request_finished)
+def record_person_cache_stats(**kwargs):
+    """Record the queries the Person cache saved in the finished request"""
+    cache.finish_request()
+
+
+@receiver(setting_changed)
+def reset_person_cache(setting, **kwargs):
+    """Rebuild the local tier when tests override the Person cache settings"""
+    if setting in ('CACHES', 'PERSON_CACHE_ALIAS', 'PERSON_CACHE_LOCAL_SIZE'):
+        cache.person_cache.reset()
@@ -1,6 +1,33 @@
-from django.test import TestCase
+import json
+import multiprocessing
+import sys
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.template.loader import get_template
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
-from .models import Person
+from django.utils import timezone
+from project.outbox.models import OutboxEvent
+from project.testing import with_jinja2_pages
+from web.sample.forms import PersonForm
+from . import cache
+from .cache import person_cache
+from .cache_backends import SampledCullFileCache
+from .models import ArchivedPerson, Person
+
+def _invalidate_in_child(pk):
+    """Runs in a forked worker process, as the worker that saved `pk`"""
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        person_cache.invalidate([pk])
+    sys.exit(0)
 
 
 class PersonModelTest(TestCase):
@@ -82,3 +109,454 @@ class PersonViewTest(TestCase):
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, 302)  # Redirect after successful creation
         self.assertTrue(Person.objects.filter(email='bob.johnson@example.com').exists())
+
+
+class PersonIndexedLookupTest(TestCase):
+    """Test cases for the generated full_name column and functional indexes"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.person = Person.objects.create(
+            first_name="Ada",
+            last_name="Lovelace",
+            email="Ada.Lovelace@example.com"
+        )
+
+    def test_full_name_follows_updates(self):
+        """Test that full_name reflects saved changes without a refresh"""
+        self.person.last_name = "Byron"
+        self.person.save()
+        self.assertEqual(self.person.full_name, "Ada Byron")
+        self.assertEqual(Person.objects.get(pk=self.person.pk).full_name, "Ada Byron")
+
+    def test_with_email_is_case_insensitive(self):
+        """Test the case-insensitive email lookup"""
+        self.assertEqual(list(Person.objects.with_email("ada.lovelace@EXAMPLE.com")), [self.person])
+        self.assertFalse(Person.objects.with_email("ada@example.com").exists())
+
+    def test_lookups_fold_case_like_the_database(self):
+        """Test that non-ASCII values match themselves on both sides of Lower()"""
+        person = Person.objects.create(first_name="Émile", last_name="Zola", email="ÉMILE@example.com")
+        self.assertEqual(list(Person.objects.with_email("ÉMILE@example.com")), [person])
+        self.assertEqual(list(Person.objects.name_startswith("Émile Z")), [person])
+        self.assertEqual(list(Person.objects.search("ÉMILE@EXAMPLE.COM")), [person])
+
+    def test_name_startswith(self):
+        """Test the full name prefix lookup"""
+        self.assertTrue(Person.objects.name_startswith("ADA LOV").exists())
+        self.assertFalse(Person.objects.name_startswith("Lovelace").exists())
+
+    def test_lookups_use_indexes(self):
+        """Test that the lookups are index seeks rather than table scans"""
+        email_plan = Person.objects.with_email("ada.lovelace@example.com").explain()
+        name_plan = Person.objects.name_startswith("ada").explain()
+        self.assertIn("sample_person_email_ci_idx", email_plan)
+        self.assertIn("sample_person_full_name_ci_idx", name_plan)
+        self.assertNotIn("SCAN", Person.objects.search("ada").explain())
+
+    def test_form_rejects_email_in_other_case(self):
+        """Test that the form email check ignores letter case"""
+        form = PersonForm(data={
+            'first_name': 'Augusta',
+            'last_name': 'King',
+            'email': 'ADA.LOVELACE@example.com'
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+
+    def test_admin_search(self):
+        """Test that admin search matches name prefixes and exact emails, and nothing else"""
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        url = reverse('admin:sample_person_changelist')
+        for term in ("ada lov", "ADA.LOVELACE@example.com"):
+            response = self.client.get(url, {'q': term})
+            self.assertEqual(response.context['cl'].result_count, 1, term)
+        for term in ("Lovelace", "lovelace@", "Hopper"):
+            response = self.client.get(url, {'q': term})
+            self.assertEqual(response.context['cl'].result_count, 0, term)
+
+    def test_person_list_search(self):
+        """Test narrowing the person list by name prefix or email"""
+        Person.objects.create(first_name="Grace", last_name="Hopper", email="grace@example.com")
+        url = reverse('sample:person_list')
+        response = self.client.get(url, {'q': 'ada'})
+        self.assertContains(response, "Ada Lovelace")
+        self.assertNotContains(response, "Grace Hopper")
+        response = self.client.get(url, {'q': 'GRACE@example.com'})
+        self.assertContains(response, "Grace Hopper")
+        self.assertNotContains(response, "Ada Lovelace")
+
+
+class PublicViewTest(TestCase):
+    """Test cases for the public pages"""
+
+    def test_home_view(self):
+        """Test the home page"""
+        response = self.client.get(reverse('public:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Welcome to Django Template")
+        self.assertContains(response, f'href="{reverse("sample:person_list")}"')
+
+    def test_contact_view_post(self):
+        """Test that a valid contact message shows the success message"""
+        response = self.client.post(reverse('public:contact'), {
+            'name': 'Jane',
+            'email': 'jane@example.com',
+            'subject': 'Hello',
+            'message': 'Hi there'
+        }, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Thank you for your message!")
+        self.assertContains(response, 'name="csrfmiddlewaretoken"')
+
+
+class PersonPageTest(TestCase):
+    """Test cases for Person page details both engines must render alike"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.person = Person.objects.create(
+            first_name="Jane",
+            last_name="Smith",
+            email="jane.smith@example.com"
+        )
+
+    def test_update_form_and_message(self):
+        """Test the prefilled edit form and the flash message after saving"""
+        url = reverse('sample:person_update', kwargs={'pk': self.person.pk})
+        response = self.client.get(url)
+        self.assertContains(response, 'value="jane.smith@example.com"')
+        self.assertContains(response, "Edit Person")
+
+        response = self.client.post(url, {
+            'first_name': 'Janet',
+            'last_name': 'Smith',
+            'email': 'jane.smith@example.com'
+        }, follow=True)
+        self.assertContains(response, "alert-success")
+        self.assertContains(response, "was updated successfully.")
+
+    def test_dates_use_local_time(self):
+        """Test that the date formatting matches the Django date filter"""
+        url = reverse('sample:person_detail', kwargs={'pk': self.person.pk})
+        response = self.client.get(url)
+        expected = self.person.created_at.strftime("%B %d, %Y")
+        self.assertContains(response, expected)
+
+
+@with_jinja2_pages
+class Jinja2PersonViewTest(PersonViewTest):
+    """Run the Person view tests with the Jinja2 engine"""
+
+    def test_pages_use_jinja2(self):
+        """Test that the page templates resolve to the Jinja2 engine"""
+        self.assertEqual(get_template('sample/person_list.html').backend.name, 'jinja2')
+        self.assertEqual(get_template('admin/base.html').backend.name, 'django')
+
+
+@with_jinja2_pages
+class Jinja2PersonPageTest(PersonPageTest):
+    """Run the Person page tests with the Jinja2 engine"""
+
+
+@with_jinja2_pages
+class Jinja2PublicViewTest(PublicViewTest):
+    """Run the public page tests with the Jinja2 engine"""
+
+
+class PersonArchiveTest(TestCase):
+    """Test cases for moving old people to the archive"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.old = Person.objects.create(first_name="Old", last_name="Timer", email="Old.Timer@example.com")
+        self.new = Person.objects.create(first_name="New", last_name="Comer", email="new.comer@example.com")
+        Person.objects.filter(pk=self.old.pk).update(created_at=timezone.now() - timedelta(days=400))
+
+    def archive(self):
+        call_command('archive_people', older_than_days=365, batch_size=1, stdout=StringIO())
+
+    def test_command_moves_old_rows(self):
+        """Test that only rows older than the cutoff move, keeping pk and timestamps"""
+        self.archive()
+        self.assertEqual(list(Person.objects.all()), [self.new])
+        archived = ArchivedPerson.objects.get()
+        self.assertEqual(archived.pk, self.old.pk)
+        self.assertEqual(archived.full_name, "Old Timer")
+        self.assertLess(archived.created_at, timezone.now() - timedelta(days=365))
+        self.assertTrue(
+            OutboxEvent.objects.filter(action=OutboxEvent.ARCHIVED, object_pk=str(self.old.pk)).exists()
+        )
+
+    def test_detail_reads_through_to_archive(self):
+        """Test that archived people are still viewable but not editable"""
+        self.archive()
+        response = self.client.get(reverse('sample:person_detail', kwargs={'pk': self.old.pk}))
+        self.assertContains(response, "Old Timer")
+        self.assertContains(response, "Archived")
+        self.assertNotContains(response, reverse('sample:person_update', kwargs={'pk': self.old.pk}))
+
+        response = self.client.get(reverse('sample:person_update', kwargs={'pk': self.old.pk}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('sample:person_detail', kwargs={'pk': 9999}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_email_unique_across_hot_and_cold(self):
+        """Test that archived emails cannot be reused in any letter case"""
+        self.archive()
+        form = PersonForm(data={'first_name': 'A', 'last_name': 'B', 'email': 'old.timer@EXAMPLE.com'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+
+        form = PersonForm(data={'first_name': 'A', 'last_name': 'B', 'email': 'fresh@example.com'})
+        self.assertTrue(form.is_valid())
+
+    def test_write_paths_reject_archived_emails(self):
+        """Test that create, bulk_create, save and update all check the archive"""
+        self.archive()
+        email, events = self.new.email, OutboxEvent.objects.count()
+        with self.assertRaises(IntegrityError):
+            Person.objects.create(first_name="A", last_name="B", email="OLD.TIMER@example.com")
+        with self.assertRaises(IntegrityError):
+            Person.objects.bulk_create([Person(first_name="A", last_name="B", email="old.timer@example.com")])
+        with self.assertRaises(IntegrityError):
+            Person.objects.filter(pk=self.new.pk).update(email="Old.Timer@example.com")
+        person = Person(first_name="A", last_name="B", email="old.timer@example.com")
+        with self.assertRaises(IntegrityError):
+            person.save()
+        self.assertIsNone(person.pk)
+        self.assertTrue(person._state.adding)
+        self.new.email = "old.timer@example.com"
+        with self.assertRaises(IntegrityError):
+            self.new.save()
+        self.assertEqual(Person.objects.count(), 1)
+        self.assertEqual(Person.objects.get().email, email)
+        self.assertEqual(OutboxEvent.objects.count(), events)
+
+    def test_sample_data_can_be_recreated_and_rearchived(self):
+        """Test that create_sample_people skips archived emails, so archiving again succeeds"""
+        call_command('create_sample_people', count=3, stdout=StringIO())
+        call_command('archive_people', before='2999-01-01', stdout=StringIO())
+        stdout = StringIO()
+        call_command('create_sample_people', count=3, stdout=stdout)
+        self.assertIn('No new people were created', stdout.getvalue())
+        call_command('archive_people', before='2999-01-01', stdout=StringIO())
+        self.assertEqual(ArchivedPerson.objects.count(), 5)
+
+    def test_archive_leaves_colliding_rows_in_place(self):
+        """Test that a hot duplicate of an archived email is skipped, not a failing batch"""
+        self.archive()
+        # A duplicate written before the write path checked the archive.
+        Person._base_manager.bulk_create([
+            Person(first_name="Old", last_name="Again", email="old.timer@EXAMPLE.com"),
+            Person(first_name="Also", last_name="Old", email="also.old@example.com"),
+        ])
+        stdout = StringIO()
+        call_command('archive_people', before='2999-01-01', batch_size=2, stdout=stdout)
+        self.assertIn('Left 1 people in place', stdout.getvalue())
+        self.assertEqual(list(Person.objects.values_list('last_name', flat=True)), ["Again"])
+        self.assertEqual(ArchivedPerson.objects.count(), 3)
+
+    def test_command_requires_one_cutoff(self):
+        """Test cutoff argument validation"""
+        with self.assertRaises(CommandError):
+            call_command('archive_people', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('archive_people', before='yesterday', stdout=StringIO())
+
+
+@with_jinja2_pages
+class Jinja2PersonArchiveTest(PersonArchiveTest):
+    """Run the archive tests with the Jinja2 engine"""
+
+
+class PersonCacheTest(TestCase):
+    """Test cases for the two-tier Person cache"""
+
+    def setUp(self):
+        """Set up test data with both cache tiers empty"""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        alias = settings.PERSON_CACHE_ALIAS
+        override = override_settings(CACHES={
+            **settings.CACHES, alias: {**settings.CACHES[alias], 'LOCATION': tmp.name},
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+        # Run the commit hooks, as a committed write would.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.people = [
+                Person.objects.create(first_name=f"P{i}", last_name="Cached", email=f"p{i}@example.com")
+                for i in range(3)
+            ]
+        self.person = self.people[0]
+
+    def test_repeat_lookups_skip_the_database(self):
+        """Test that only the first detail page view queries the database"""
+        url = reverse('sample:person_detail', kwargs={'pk': self.person.pk})
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, "P0 Cached")
+        self.assertEqual(response.context['person'].created_at, self.person.created_at)
+
+    def test_tiers_are_shared_across_processes(self):
+        """Test that a save in another worker process retires this process's copies"""
+        self.assertTrue(person_cache.enabled)
+        self.assertEqual(person_cache.get(self.person.pk).first_name, "P0")
+        # Another worker writes the row, then bumps the version in its own process.
+        Person._base_manager.filter(pk=self.person.pk).update(first_name="Elsewhere")
+        worker = multiprocessing.get_context('fork').Process(target=_invalidate_in_child, args=(self.person.pk,))
+        worker.start()
+        worker.join()
+        self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(person_cache.get(self.person.pk).first_name, "Elsewhere")
+
+    def test_process_local_backend_turns_cache_off(self):
+        """Test that a LocMem or dummy shared tier reads straight from the database"""
+        alias = settings.PERSON_CACHE_ALIAS
+        for backend in ('locmem.LocMemCache', 'dummy.DummyCache'):
+            caches_setting = {**settings.CACHES, alias: {'BACKEND': f'django.core.cache.backends.{backend}'}}
+            with override_settings(CACHES=caches_setting):
+                self.assertFalse(person_cache.enabled)
+                person_cache.get(self.person.pk)
+                with self.assertNumQueries(1):
+                    person_cache.get(self.person.pk)
+
+    def test_writes_are_never_served_stale(self):
+        """Test that saves, bulk updates, deletes and archiving all retire cached rows"""
+        person_cache.get(self.person.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('sample:person_update', kwargs={'pk': self.person.pk}), {
+                'first_name': 'Edited', 'last_name': 'Cached', 'email': self.person.email,
+            })
+        self.assertEqual(person_cache.get(self.person.pk).first_name, 'Edited')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Person.objects.filter(last_name="Cached").update(last_name="Bulk")
+        self.assertEqual(person_cache.get(self.person.pk).full_name, 'Edited Bulk')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Person.objects.filter(pk=self.person.pk).archive()
+        with self.assertRaises(Person.DoesNotExist):
+            person_cache.get(self.person.pk)
+
+        other = self.people[1]
+        person_cache.get(other.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        with self.assertRaises(Person.DoesNotExist):
+            person_cache.get(other.pk)
+
+    def test_transaction_reads_its_own_writes(self):
+        """Test that rows written in an open transaction bypass the cache until it commits"""
+        person_cache.get(self.person.pk)
+        person_cache.get(self.people[1].pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Person.objects.filter(pk=self.person.pk).update(first_name="Uncommitted")
+            with self.assertNumQueries(1):
+                self.assertEqual(person_cache.get(self.person.pk).first_name, "Uncommitted")
+            with self.assertNumQueries(0):
+                person_cache.get(self.people[1].pk)
+        version = person_cache.version(self.person.pk)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(person_cache.version(self.person.pk), version)
+        with self.assertNumQueries(1):
+            person_cache.get(self.person.pk)
+        with self.assertNumQueries(0):
+            person_cache.get(self.person.pk)
+
+    def test_large_batches_bump_one_generation(self):
+        """Test that a bulk write over MAX_VERSION_BUMPS rows writes one key, not one per row"""
+        shared = caches[settings.PERSON_CACHE_ALIAS]
+        person_cache.get(self.people[1].pk)
+        with mock.patch.object(cache, 'MAX_VERSION_BUMPS', 2), \
+                mock.patch.object(shared, 'set', wraps=shared.set) as set_key, \
+                mock.patch.object(shared, 'set_many', wraps=shared.set_many) as set_many:
+            with self.captureOnCommitCallbacks(execute=True):
+                Person.objects.update(last_name="Batch")
+        self.assertEqual(set_key.call_count, 1)
+        self.assertFalse(set_many.called)
+        self.assertEqual(person_cache.get(self.people[1].pk).last_name, "Batch")
+
+    def test_entries_are_compact_json(self):
+        """Test that the shared tier holds JSON rows rather than pickled instances"""
+        person_cache.get(self.person.pk)
+        version = person_cache.version(self.person.pk)
+        row = caches[settings.PERSON_CACHE_ALIAS].get(f'{person_cache.key_prefix()}:{self.person.pk}:{version}')
+        self.assertIsInstance(row, str)
+        self.assertEqual(json.loads(row)[:3], [self.person.pk, "P0", "Cached"])
+
+        person_cache.reset()
+        copy = person_cache.get(self.person.pk)
+        self.assertEqual(copy, self.person)
+        self.assertEqual(copy.updated_at, self.person.updated_at)
+        self.assertFalse(copy._state.adding)
+
+    def test_local_tier_is_bounded(self):
+        """Test that the per-process tier evicts its least recently used row"""
+        with override_settings(PERSON_CACHE_LOCAL_SIZE=2):
+            for person in self.people:
+                person_cache.get(person.pk)
+            self.assertEqual(len(person_cache.local), 2)
+            self.assertIsNone(person_cache.local.get(self.people[0].pk))
+
+            before = person_cache.stats()
+            person_cache.get(self.people[0].pk)
+            person_cache.get(self.people[2].pk)
+            after = person_cache.stats()
+        self.assertEqual(after['shared_hits'] - before['shared_hits'], 1)
+        self.assertEqual(after['local_hits'] - before['local_hits'], 1)
+
+    def test_evicted_version_does_not_revive_old_rows(self):
+        """Test that losing the shared tier cannot make a stale local row current"""
+        person_cache.get(self.person.pk)
+        caches[settings.PERSON_CACHE_ALIAS].clear()
+        # A write whose version bump was lost along with the shared tier.
+        Person._base_manager.filter(pk=self.person.pk).update(first_name="Changed")
+        self.assertEqual(person_cache.get(self.person.pk).first_name, "Changed")
+
+    def test_request_stats(self):
+        """Test the hit ratio and queries saved reported for a request"""
+        cache.start_request()
+        for _ in range(4):
+            person_cache.get(self.person.pk)
+        stats = cache.request_stats()
+        cache.finish_request()
+        self.assertEqual(stats['lookups'], 4)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['queries_saved'], 3)
+        self.assertEqual(stats['hit_ratio'], 0.75)
+
+    def test_admin_change_view_uses_cache(self):
+        """Test that the admin change page reads the person through the cache"""
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        url = reverse('admin:sample_person_change', args=[self.person.pk])
+        before = person_cache.stats()
+        self.assertContains(self.client.get(url), self.person.email)
+        self.assertContains(self.client.get(url), self.person.email)
+        after = person_cache.stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['local_hits'] - before['local_hits'], 1)
+        self.assertEqual(self.client.get(reverse('admin:sample_person_change', args=['nope'])).status_code, 302)
+
+
+class SampledCullFileCacheTest(SimpleTestCase):
+    """Test cases for the shared tier's file cache backend"""
+
+    def test_culls_on_sampled_writes_only(self):
+        """Test that the directory is only listed on the writes that draw a cull"""
+        with tempfile.TemporaryDirectory() as directory:
+            options = {'MAX_ENTRIES': 2, 'CULL_FREQUENCY': 2, 'CULL_EVERY': 100}
+            shared = SampledCullFileCache(directory, {'OPTIONS': options})
+            with mock.patch('random.random', return_value=0.5):
+                for n in range(4):
+                    shared.set(f'key{n}', n)
+            self.assertEqual(len(shared._list_cache_files()), 4)
+            with mock.patch('random.random', return_value=0.0):
+                shared.set('key4', 4)
+            self.assertEqual(len(shared._list_cache_files()), 3)
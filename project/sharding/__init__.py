@@ -0,0 +1,14 @@
+"""
+Sharding app
+
+Hash-sharded storage for the Person model across several databases:
+- Rows are placed on one of ``settings.PERSON_SHARDS`` by a hash of the email
+- Primary keys encode the shard, so lookups by pk go to exactly one database
+- Ids come from per-shard blocks, so shards never coordinate on writes
+- Scatter-gather reads merge the per-shard results in model ordering
+
+Sharding is off while ``PERSON_SHARDS`` is empty, and everything stays on
+the ``default`` database.
+"""
+
+default_app_config = 'project.sharding.apps.ShardingConfig'
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+            options={
+                'verbose_name': 'Id block',
+                'verbose_name_plural': 'Id blocks',
+            },
+        ),
+    ]
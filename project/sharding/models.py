@@ -0,0 +1,15 @@
+from django.db import models
+
+# Create your models here.
+
+class IdBlock(models.Model):
+    """High-water mark of ids handed out on one shard for one sequence"""
+    name = models.CharField(max_length=100, unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    class Meta:
+        verbose_name = "Id block"
+        verbose_name_plural = "Id blocks"
+
+    def __str__(self):
+        return self.name
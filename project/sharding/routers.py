@@ -0,0 +1,51 @@
+"""
+Database router for hash-sharded models
+"""
+from .shards import UnpinnedQuery, enabled, shard_aliases, shard_for_email, shard_for_pk
+
+# Apps whose tables exist on every shard database.
+SHARDED_APPS = {'sample', 'outbox', 'backfill', 'sharding'}
+
+
+class ShardRouter:
+    """
+    Route sharded models by the instance at hand.
+
+    Instances with a pk go to the shard encoded in it, new ones to the shard
+    of their email. A read without an instance raises UnpinnedQuery rather
+    than quietly reading one shard: pick a shard with ``.using()``, or read
+    them all with ``shards.scatter()``, ``shards.merge_ordered()`` or a
+    ``ScatterReadsMixin`` queryset. A write without an instance, which
+    Django's deletion collector asks for, goes to the first shard; Person
+    querysets place or fan out their own writes.
+    """
+
+    def _route(self, model, instance, write=False):
+        if not enabled() or model._meta.app_label not in SHARDED_APPS:
+            return None
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if instance is not None and hasattr(instance, 'email'):
+            if instance.pk is not None:
+                return shard_for_pk(instance.pk)
+            return shard_for_email(instance.email)
+        if not write:
+            raise UnpinnedQuery(
+                f'{model._meta.label} is sharded; read it with using(), shards.scatter() '
+                'or shards.merge_ordered().'
+            )
+        return shard_aliases()[0]
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints.get('instance'), write=True)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label in SHARDED_APPS:
+            return True
+        return db == 'default'
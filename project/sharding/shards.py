@@ -0,0 +1,238 @@
+"""
+Shard placement, id allocation and scatter-gather reads
+
+A sharded primary key is ``local_id * MAX_SHARDS + shard_index``, where
+``shard_index`` is the alias position in ``settings.PERSON_SHARDS``. Emails
+are placed by hash modulo the list's length, so the list is fixed once data
+has been written; even appending an alias moves existing emails.
+"""
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+from functools import cmp_to_key
+from operator import attrgetter
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from django.db.models.query import ModelIterable
+
+from .models import IdBlock
+
+MAX_SHARDS = 1024
+ID_BLOCK_SIZE = 100
+
+# (alias, sequence) -> (next local id, end of the reserved block)
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+class UnpinnedQuery(Exception):
+    """A sharded model was read without naming the shard to read from"""
+
+
+def shard_aliases():
+    """Database aliases holding sharded rows, in shard index order"""
+    return list(getattr(settings, 'PERSON_SHARDS', []))
+
+
+def enabled():
+    return bool(getattr(settings, 'PERSON_SHARDS', None))
+
+
+def shard_for_email(email):
+    """Alias of the shard that owns `email`, compared case-insensitively"""
+    aliases = shard_aliases()
+    digest = hashlib.blake2b(email.lower().encode('utf-8'), digest_size=8).digest()
+    return aliases[int.from_bytes(digest, 'big') % len(aliases)]
+
+
+def shard_for_pk(pk):
+    """Alias of the shard encoded in a sharded primary key"""
+    aliases = shard_aliases()
+    index = int(pk) % MAX_SHARDS
+    if index >= len(aliases):
+        raise ValueError(f'Primary key {pk} names unknown shard {index}.')
+    return aliases[index]
+
+
+def db_for_pk(pk):
+    """Alias for a pk when sharding is on, otherwise None to defer to routing"""
+    if not enabled():
+        return None
+    try:
+        return shard_for_pk(pk)
+    except (TypeError, ValueError):
+        return shard_aliases()[0]
+
+
+def db_for_email(email):
+    """Alias for an email when sharding is on, otherwise None to defer to routing"""
+    return shard_for_email(email) if enabled() else None
+
+
+def allocate_ids(alias, sequence, count=1):
+    """`count` new sharded ids on `alias`"""
+    if not count:
+        return []
+    index = shard_aliases().index(alias)
+    if connections[alias].in_atomic_block:
+        # The caller may still roll back the reservation, so keep no leftovers.
+        first = _reserve_block(alias, sequence, count)
+    else:
+        with _blocks_lock:
+            first, end = _blocks.get((alias, sequence), (0, 0))
+            if end - first < count:
+                size = max(count, ID_BLOCK_SIZE)
+                first = _reserve_block(alias, sequence, size)
+                end = first + size
+            _blocks[(alias, sequence)] = (first + count, end)
+    return [local_id * MAX_SHARDS + index for local_id in range(first, first + count)]
+
+
+def allocate_id(alias, sequence):
+    """Next sharded id on `alias`"""
+    return allocate_ids(alias, sequence)[0]
+
+
+def _reserve_block(alias, sequence, size):
+    """Claim `size` local ids on the shard and return the first one"""
+    blocks = IdBlock.objects.using(alias).filter(name=sequence)
+    with transaction.atomic(using=alias):
+        # Write first, so SQLite takes its write lock before any read.
+        if not blocks.update(next_value=F('next_value') + size):
+            check_no_unsharded_rows(alias, sequence)
+            IdBlock.objects.using(alias).get_or_create(name=sequence)
+            blocks.update(next_value=F('next_value') + size)
+        return blocks.values_list('next_value', flat=True).get() - size
+
+
+def check_no_unsharded_rows(alias, sequence):
+    """
+    Refuse to start a sequence on `alias` over rows written before sharding.
+
+    Those rows have autoincrement ids, which decode through ``pk % MAX_SHARDS``
+    to an arbitrary shard, and which new sharded ids would collide with. The
+    same goes for rows left on 'default' when it is not a shard.
+    """
+    try:
+        model = apps.get_model(sequence)
+    except (LookupError, ValueError):
+        return  # Not a model's sequence.
+    aliases = [alias]
+    if DEFAULT_DB_ALIAS not in shard_aliases():
+        aliases.append(DEFAULT_DB_ALIAS)
+    for database in aliases:
+        if model._base_manager.using(database).exists():
+            raise ImproperlyConfigured(
+                f'{database} holds {model._meta.verbose_name_plural} written before sharding was '
+                f'turned on. Sharding must start from empty databases.'
+            )
+
+
+def reset_blocks():
+    """Forget reserved blocks, e.g. after the shard databases were recreated"""
+    with _blocks_lock:
+        _blocks.clear()
+
+
+def _reset_blocks_in_child():
+    # A forked worker must not hand out the ids its parent reserved. Another
+    # parent thread may have held the lock at fork time, so replace it too.
+    global _blocks_lock
+    _blocks_lock = threading.Lock()
+    _blocks.clear()
+
+
+def scatter(queryset):
+    """One copy of an unsliced queryset per shard, or the queryset itself"""
+    if not enabled() or queryset._db is not None:
+        return [queryset]
+    return [queryset.using(alias) for alias in shard_aliases()]
+
+
+def merge_ordered(queryset):
+    """
+    Evaluate `queryset` on every shard and k-way merge the rows.
+
+    The ordering must be plain field names, and the databases must collate
+    like Python string comparison (SQLite's default BINARY collation does).
+    A sliced queryset reads up to its end from each shard and slices the
+    merged rows.
+    """
+    parts = scatter(queryset)
+    if len(parts) == 1:
+        return list(queryset)
+
+    query = queryset.query
+    ordering = list(query.order_by or (queryset.model._meta.ordering if query.default_ordering else ()))
+    if any(not isinstance(name, str) or name == '?' or '__' in name for name in ordering):
+        raise ValueError(f'Cannot merge shards ordered by {ordering}.')
+    low, high = query.low_mark, query.high_mark
+    if query.is_sliced:
+        # The merged rows up to `high` are among each shard's first `high` rows.
+        parts = [part._chain() for part in parts]
+        for part in parts:
+            part.query.clear_limits()
+            part.query.set_limits(high=high)
+    merged = heapq.merge(*parts, key=_ordering_key(ordering)) if ordering else itertools.chain(*parts)
+    return list(itertools.islice(merged, low, high))
+
+
+def _ordering_key(ordering):
+    """A sort key for field names, each ascending or descending, with NULLs first"""
+    fields = [(attrgetter(name.lstrip('-')), name.startswith('-')) for name in ordering]
+
+    def compare(first, second):
+        for get, descending in fields:
+            a, b = get(first), get(second)
+            if a != b:
+                result = -1 if a is None or (b is not None and a < b) else 1
+                return -result if descending else result
+        return 0
+
+    return cmp_to_key(compare)
+
+
+class ScatterReadsMixin:
+    """
+    QuerySet mixin that reads every shard when the queryset is not pinned.
+
+    Iterating model instances, and so slicing, ``get()`` and ``first()``,
+    merges the shards in the queryset's ordering; ``count()`` and
+    ``exists()`` add up per-shard answers. Other reads, such as
+    ``values()``, ``aggregate()`` or ``iterator()``, still need ``using()``
+    or ``scatter()``, and the router raises UnpinnedQuery without one.
+    """
+
+    def _scatters(self):
+        return enabled() and self._db is None and self._result_cache is None
+
+    def _fetch_all(self):
+        if self._scatters() and self._iterable_class is ModelIterable:
+            self._result_cache = merge_ordered(self)
+        super()._fetch_all()
+
+    def count(self):
+        if not self._scatters():
+            return super().count()
+        if self.query.is_sliced:
+            self._fetch_all()
+            return len(self._result_cache)
+        return sum(part.count() for part in scatter(self))
+
+    def exists(self):
+        if not self._scatters():
+            return super().exists()
+        if self.query.is_sliced:
+            self._fetch_all()
+            return bool(self._result_cache)
+        return any(part.exists() for part in scatter(self))
+
+
+os.register_at_fork(after_in_child=_reset_blocks_in_child)
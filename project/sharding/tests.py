@@ -0,0 +1,290 @@
+import multiprocessing
+import sys
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from project.outbox.models import OutboxEvent
+from project.sample.models import ArchivedPerson, Person
+from web.sample.forms import PersonForm
+from . import shards
+from .models import IdBlock
+
+SHARDS = ['default', 'shard1', 'shard2']
+
+# The spare shard databases are defined in config.settings_test.
+SHARD_DATABASES = {'default'} | {'shard1', 'shard2', 'shard3'} & set(settings.DATABASES)
+needs_shard_databases = skipUnless(len(SHARD_DATABASES) == 4, 'Needs config.settings_test.')
+
+
+def email_on(alias, prefix='person'):
+    """An email address that hashes to the given shard"""
+    for i in range(1000):
+        email = f'{prefix}{i}@example.com'
+        if shards.shard_for_email(email) == alias:
+            return email
+    raise AssertionError(f'No email found for {alias}')
+
+
+def _exit_with_cached_blocks():
+    """Runs in a forked worker process"""
+    sys.exit(len(shards._blocks))
+
+
+@needs_shard_databases
+@override_settings(PERSON_SHARDS=SHARDS)
+class ShardPlacementTest(TestCase):
+    """Test cases for placing and routing Person rows by shard"""
+    databases = SHARD_DATABASES
+
+    def setUp(self):
+        shards.reset_blocks()
+
+    def test_person_is_stored_on_the_shard_of_its_email(self):
+        """Test that a new person lands only on the shard its email hashes to"""
+        email = email_on('shard2')
+        person = Person.objects.create(first_name='Ada', last_name='Lovelace', email=email)
+
+        self.assertEqual(shards.shard_for_pk(person.pk), 'shard2')
+        self.assertEqual(person._state.db, 'shard2')
+        self.assertTrue(Person.objects.using('shard2').filter(pk=person.pk).exists())
+        self.assertFalse(Person.objects.using('default').filter(email=email).exists())
+        self.assertFalse(Person.objects.using('shard1').filter(email=email).exists())
+
+    def test_email_letter_case_does_not_change_the_shard(self):
+        """Test that case variants of an email share a shard, so uniqueness holds"""
+        email = email_on('shard1')
+        self.assertEqual(shards.shard_for_email(email.upper()), 'shard1')
+
+        Person.objects.create(first_name='Ada', last_name='Lovelace', email=email)
+        form = PersonForm(data={'first_name': 'A', 'last_name': 'L', 'email': email.upper()})
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+
+    def test_ids_are_unique_across_shards(self):
+        """Test that bulk and single inserts hand out distinct, shard-encoded ids"""
+        people = Person.objects.bulk_create(
+            Person(first_name=f'F{i}', last_name='L', email=f'bulk{i}@example.com')
+            for i in range(30)
+        )
+        people.append(Person.objects.create(first_name='One', last_name='More', email='one@example.com'))
+
+        pks = [person.pk for person in people]
+        self.assertEqual(len(set(pks)), len(pks))
+        for person in people:
+            self.assertEqual(shards.shard_for_pk(person.pk), shards.shard_for_email(person.email))
+        stored = sum(Person.objects.using(alias).count() for alias in SHARDS)
+        self.assertEqual(stored, 31)
+
+    def test_ids_reserved_in_a_transaction_are_not_cached(self):
+        """Test that a caller's transaction claims exactly the ids it uses"""
+        self.assertTrue(connections['shard1'].in_atomic_block)
+        shards.allocate_ids('shard1', 'tests.sequence', 3)
+        self.assertEqual(IdBlock.objects.using('shard1').get(name='tests.sequence').next_value, 4)
+
+    def test_changing_email_moves_the_person(self):
+        """Test that a new email hashing elsewhere re-homes the row under a new pk"""
+        person = Person.objects.create(first_name='Ada', last_name='Lovelace', email=email_on('shard1'))
+        old_pk = person.pk
+
+        person = Person.objects.for_pk(old_pk).get(pk=old_pk)
+        person.email = email_on('shard2', prefix='moved')
+        person.save()
+
+        self.assertNotEqual(person.pk, old_pk)
+        self.assertEqual(shards.shard_for_pk(person.pk), 'shard2')
+        self.assertFalse(Person.objects.using('shard1').filter(pk=old_pk).exists())
+        self.assertTrue(Person.objects.using('shard2').filter(pk=person.pk).exists())
+        deleted = OutboxEvent.objects.using('shard1').filter(action=OutboxEvent.DELETED)
+        created = OutboxEvent.objects.using('shard2').filter(action=OutboxEvent.CREATED)
+        self.assertTrue(deleted.filter(object_pk=str(old_pk)).exists())
+        self.assertTrue(created.filter(object_pk=str(person.pk)).exists())
+
+    def test_queryset_writes_fan_out_to_every_shard(self):
+        """Test that unpinned update() and delete() reach all shards"""
+        for alias in SHARDS:
+            Person.objects.create(first_name='F', last_name='L', email=email_on(alias))
+
+        self.assertEqual(Person.objects.filter(last_name='L').update(last_name='M'), 3)
+        deleted, per_model = Person.objects.filter(last_name='M').delete()
+        self.assertEqual(per_model['sample.Person'], 3)
+        self.assertEqual(sum(Person.objects.using(alias).count() for alias in SHARDS), 0)
+
+    def test_unpinned_reads_cover_every_shard(self):
+        """Test that Person querysets without using() count, get and slice across shards"""
+        for n, alias in enumerate(SHARDS):
+            Person.objects.create(first_name=f'F{n}', last_name='L', email=email_on(alias))
+
+        people = Person.objects.filter(last_name='L')
+        self.assertEqual(people.count(), 3)
+        self.assertTrue(people.filter(first_name='F2').exists())
+        self.assertEqual(Person.objects.get(first_name='F2').email, email_on('shard2'))
+        newest_first = people.order_by('last_name', '-first_name')
+        self.assertEqual([person.first_name for person in newest_first[1:]], ['F1', 'F0'])
+        self.assertEqual(newest_first[:2].count(), 2)
+
+    def test_unpinned_reads_of_other_queries_raise(self):
+        """Test that reads the querysets cannot merge fail instead of reading one shard"""
+        Person.objects.create(first_name='F', last_name='L', email=email_on('shard1'))
+        with self.assertRaises(shards.UnpinnedQuery):
+            list(Person.objects.values_list('email', flat=True))
+        with self.assertRaises(shards.UnpinnedQuery):
+            OutboxEvent.objects.count()
+        self.assertEqual(OutboxEvent.objects.using('shard1').count(), 1)
+
+    def test_archive_command_covers_every_shard(self):
+        """Test that archive_people archives old people on each shard"""
+        for alias in SHARDS:
+            Person.objects.create(first_name='F', last_name='L', email=email_on(alias))
+
+        call_command('archive_people', before='2999-01-01', stdout=StringIO())
+
+        for alias in SHARDS:
+            self.assertEqual(Person.objects.using(alias).count(), 0)
+            self.assertEqual(ArchivedPerson.objects.using(alias).count(), 1)
+
+    def test_backfill_command_covers_every_shard(self):
+        """Test that backfill without --database walks each shard with its own checkpoint"""
+        for alias in SHARDS:
+            Person.objects.create(first_name=' Padded ', last_name='L', email=email_on(alias))
+
+        stdout = StringIO()
+        call_command('backfill', 'sample.normalize_person_names', sleep_ratio=0, stdout=stdout)
+
+        for alias in SHARDS:
+            self.assertEqual(Person.objects.using(alias).get().first_name, 'Padded')
+            self.assertIn(f'on {alias}: complete, 1 rows changed', stdout.getvalue())
+        stdout = StringIO()
+        call_command('backfill', list=True, stdout=stdout)
+        self.assertIn('default complete (1 rows changed), shard1 complete', stdout.getvalue())
+
+    def test_compact_outbox_covers_every_shard(self):
+        """Test that compact_outbox without --database trims each shard's outbox"""
+        for alias in SHARDS:
+            Person.objects.create(first_name='F', last_name='L', email=email_on(alias))
+
+        call_command('compact_outbox', max_age_hours=0, stdout=StringIO())
+        for alias in SHARDS:
+            self.assertFalse(OutboxEvent.objects.using(alias).exists())
+
+
+@needs_shard_databases
+class UnshardedDataTest(TestCase):
+    """Test cases for turning sharding on over existing rows"""
+    databases = SHARD_DATABASES
+
+    def setUp(self):
+        shards.reset_blocks()
+        self.addCleanup(shards.reset_blocks)
+
+    def test_first_sharded_write_refuses_unsharded_rows(self):
+        """Test that rows with autoincrement ids block sharded writes on their database"""
+        Person.objects.create(first_name='Old', last_name='Row', email='old@example.com')
+        with override_settings(PERSON_SHARDS=SHARDS):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'written before sharding was turned on'):
+                Person.objects.create(first_name='New', last_name='Row', email=email_on('default'))
+        with override_settings(PERSON_SHARDS=['shard1', 'shard2']):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'default holds People'):
+                Person.objects.create(first_name='New', last_name='Row', email=email_on('shard2'))
+
+
+class IdBlockForkTest(SimpleTestCase):
+    """Test cases for id blocks across forked worker processes"""
+
+    def test_forked_children_forget_reserved_blocks(self):
+        """Test that a child never reuses ids its parent reserved before the fork"""
+        self.addCleanup(shards.reset_blocks)
+        shards._blocks[('shard1', 'tests.sequence')] = (5, 100)
+        worker = multiprocessing.get_context('fork').Process(target=_exit_with_cached_blocks)
+        worker.start()
+        worker.join()
+        self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(len(shards._blocks), 1)
+
+
+@needs_shard_databases
+@override_settings(PERSON_SHARDS=SHARDS)
+class ShardedViewTest(TestCase):
+    """Test cases for the sample pages with sharding on"""
+    databases = SHARD_DATABASES
+
+    def setUp(self):
+        shards.reset_blocks()
+        names = [('Carol', 'Young'), ('Alice', 'Adams'), ('Bob', 'Young'), ('Dave', 'Baker')]
+        self.people = [
+            Person.objects.create(first_name=first, last_name=last, email=email_on(alias, prefix=first))
+            for (first, last), alias in zip(names, SHARDS + SHARDS)
+        ]
+
+    def test_list_merges_shards_in_name_order(self):
+        """Test that person_list k-way merges shards by last then first name"""
+        response = self.client.get(reverse('sample:person_list'))
+        names = [str(person) for person in response.context['people']]
+        self.assertEqual(names, ['Alice Adams', 'Dave Baker', 'Bob Young', 'Carol Young'])
+        self.assertEqual({shards.shard_for_pk(p.pk) for p in self.people}, set(SHARDS))
+
+    def test_list_search_covers_every_shard(self):
+        """Test that a name search matches on all shards"""
+        response = self.client.get(reverse('sample:person_list'), {'q': 'b'})
+        self.assertEqual([str(p) for p in response.context['people']], ['Bob Young'])
+
+    def test_detail_reads_one_shard(self):
+        """Test that person_detail queries only the shard encoded in the pk"""
+        person = self.people[2]
+        with self.assertNumQueries(0, using='default'), self.assertNumQueries(0, using='shard1'):
+            response = self.client.get(reverse('sample:person_detail', args=[person.pk]))
+        self.assertContains(response, 'Bob Young')
+
+    def test_update_and_delete_route_to_the_shard(self):
+        """Test that person_update and person_delete act on the right shard"""
+        person = self.people[1]
+        response = self.client.post(reverse('sample:person_update', args=[person.pk]), {
+            'first_name': 'Alicia', 'last_name': 'Adams', 'email': person.email,
+        })
+        self.assertRedirects(response, reverse('sample:person_detail', args=[person.pk]))
+        self.assertEqual(Person.objects.for_pk(person.pk).get(pk=person.pk).first_name, 'Alicia')
+
+        response = self.client.post(reverse('sample:person_delete', args=[person.pk]))
+        self.assertRedirects(response, reverse('sample:person_list'))
+        self.assertFalse(Person.objects.using('shard1').filter(pk=person.pk).exists())
+
+    def test_admin_change_view_opens_sharded_person(self):
+        """Test that the admin finds a person on a non-default shard"""
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        person = self.people[2]
+        response = self.client.get(reverse('admin:sample_person_change', args=[person.pk]))
+        self.assertContains(response, person.email)
+        response = self.client.get(reverse('admin:sample_person_changelist'), {'shard': 'shard2'})
+        self.assertContains(response, person.email)
+        self.assertNotContains(response, self.people[1].email)
+
+    def test_admin_changelist_reads_every_shard(self):
+        """Test that the changelist lists and counts people from all shards by default"""
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        response = self.client.get(reverse('admin:sample_person_changelist'))
+        self.assertEqual(
+            [str(person) for person in response.context['cl'].result_list],
+            ['Alice Adams', 'Dave Baker', 'Bob Young', 'Carol Young'],
+        )
+        self.assertEqual(response.context['cl'].result_count, 4)
+
+    def test_change_feed_follows_one_shard(self):
+        """Test that the outbox feed reads the requested shard's events"""
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get(reverse('outbox:changes'), {'shard': 'shard2', 'wait': 0})
+        self.assertEqual(
+            [event['object_pk'] for event in response.json()['events']],
+            [str(self.people[2].pk)],
+        )
+        response = self.client.get(reverse('outbox:changes'), {'shard': 'nope', 'wait': 0})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('outbox:changes'), {'wait': 0})
+        self.assertContains(response, 'shard is required', status_code=400)
@@ -0,0 +1,34 @@
+"""
+Fixtures shared by the apps' test cases
+"""
+import tempfile
+from unittest import skipIf
+
+from django.conf import settings
+from django.test import override_settings
+
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
+
+
+class TempDirSettingMixin:
+    """Point the setting named in `temp_dir_setting` at a fresh temporary directory for each test"""
+    temp_dir_setting = None
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(**{self.temp_dir_setting: self.tmp.name})
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+def with_jinja2_pages(test_class):
+    """Run a test case with the web/ pages rendered by the Jinja2 engine"""
+    test_class = override_settings(
+        TEMPLATES=[settings.JINJA2_TEMPLATES, settings.DJANGO_TEMPLATES]
+    )(test_class)
+    return skipIf(jinja2 is None, "Jinja2 is not installed")(test_class)
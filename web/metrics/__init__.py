@@ -0,0 +1,5 @@
+"""
+Metrics web components
+
+Exposes the aggregated per-view metrics in the Prometheus text format.
+"""
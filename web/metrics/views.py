@@ -0,0 +1,14 @@
+"""
+Metrics views
+"""
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from project.metrics.metrics import render
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@require_GET
+def metrics(request):
+    """Prometheus scrape endpoint aggregating every worker's metrics"""
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,7 @@
+"""
+Outbox web components
+
+Serves the change feed to downstream consumers, either as a server-sent
+event stream or as a JSON long-poll. Run under ``config.asgi`` so waiting
+consumers don't hold a worker thread.
+"""
@@ -0,0 +1,11 @@
+"""
+Outbox URLs
+"""
+from django.urls import path
+from . import views
+
+app_name = 'outbox'
+
+urlpatterns = [
+    path('changes/', views.changes, name='changes'),
+]
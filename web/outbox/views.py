@@ -0,0 +1,143 @@
+"""
+Outbox views
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.views.decorators.http import require_GET
+from project.outbox.models import OutboxConsumer, OutboxEvent
+from project.sharding.shards import enabled, shard_aliases
+
+POLL_INTERVAL = 0.5
+HEARTBEAT_SECONDS = 15
+# Streams end after this long; EventSource clients reconnect with Last-Event-ID.
+MAX_STREAM_SECONDS = 55
+MAX_WAIT_SECONDS = 30
+MAX_BATCH = 500
+
+
+def _fetch(after, topic, limit, using=None):
+    events = OutboxEvent.objects.using(using).after(after, topic)[:limit]
+    return [event.as_message() for event in events]
+
+
+def _acknowledge(consumer, after, using=None):
+    """Move a consumer's position forward; compaction trims behind the slowest one"""
+    OutboxConsumer.objects.using(using).filter(pk=consumer.pk, last_id__lt=after).update(last_id=after)
+
+
+async def _authenticate(request, using=None):
+    """
+    The consumer whose bearer token the request carries, True for a staff
+    user's session, or None when the caller may not read the feed.
+    """
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token:
+        token_hash = OutboxConsumer.hash_token(token.strip())
+        return await OutboxConsumer.objects.using(using).filter(token_hash=token_hash).afirst()
+    user = await request.auser()
+    return True if user.is_active and user.is_staff else None
+
+
+def _int_param(request, name, default, maximum=None):
+    value = int(request.GET.get(name, default))
+    if value < 0:
+        raise ValueError(name)
+    return min(value, maximum) if maximum is not None else value
+
+
+@require_GET
+async def changes(request):
+    """
+    Events after the sequence id in ``after`` (or the Last-Event-ID header).
+
+    Callers authenticate with ``Authorization: Bearer <token>`` for a
+    consumer registered with the outbox_consumer command, or as a logged-in
+    staff user. Query parameters: ``topic`` to filter (e.g.
+    ``sample.person``), ``limit`` per batch, ``wait`` seconds to hold an empty
+    long-poll, ``consumer`` to record this position for compaction (token
+    holders only, for their own consumer), and ``shard`` to follow one Person
+    shard's outbox, which is required when sharding is on. Send
+    ``Accept: text/event-stream`` for a server-sent event stream, lasting at
+    most ``duration`` seconds, instead of a single JSON batch.
+    """
+    try:
+        after = _int_param(request, 'after', request.headers.get('Last-Event-ID', 0))
+        limit = max(_int_param(request, 'limit', 100, MAX_BATCH), 1)
+        wait = _int_param(request, 'wait', MAX_WAIT_SECONDS, MAX_WAIT_SECONDS)
+        duration = _int_param(request, 'duration', MAX_STREAM_SECONDS, MAX_STREAM_SECONDS)
+    except ValueError:
+        return HttpResponseBadRequest(
+            'after, limit, wait and duration must be non-negative integers.'
+        )
+    topic = request.GET.get('topic')
+    using = request.GET.get('shard')
+    if enabled() and using is None:
+        # Sequence ids are per shard, so one feed cannot span them.
+        return HttpResponseBadRequest('shard is required while Person sharding is on.')
+    if using is not None and using not in shard_aliases():
+        return HttpResponseBadRequest('shard must be one of the configured Person shards.')
+
+    caller = await _authenticate(request, using)
+    if caller is None:
+        response = HttpResponse('Authentication required.', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    consumer = request.GET.get('consumer')
+    if consumer:
+        if caller is True or caller.name != consumer:
+            return HttpResponseForbidden("Only the consumer's own token can record its position.")
+        await sync_to_async(_acknowledge)(caller, after, using)
+
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        response = StreamingHttpResponse(
+            _event_stream(after, topic, limit, duration, using),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        events = await sync_to_async(_fetch)(after, topic, limit, using)
+        remaining = deadline - loop.time()
+        if events or remaining <= 0:
+            break
+        await asyncio.sleep(min(POLL_INTERVAL, remaining))
+
+    last_id = events[-1]['id'] if events else after
+    return JsonResponse({'events': events, 'last_id': last_id})
+
+
+async def _event_stream(after, topic, limit, duration, using=None):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    last_write = loop.time()
+    yield f'retry: {int(POLL_INTERVAL * 1000)}\n\n'
+    while True:
+        events = await sync_to_async(_fetch)(after, topic, limit, using)
+        for event in events:
+            data = json.dumps(event, cls=DjangoJSONEncoder)
+            yield f'id: {event["id"]}\nevent: {event["action"]}\ndata: {data}\n\n'
+        now = loop.time()
+        if events:
+            after = events[-1]['id']
+            last_write = now
+        elif now - last_write >= HEARTBEAT_SECONDS:
+            yield ': keep-alive\n\n'
+            last_write = now
+        if now >= deadline:
+            break
+        if len(events) < limit:
+            await asyncio.sleep(min(POLL_INTERVAL, max(deadline - now, 0)))
@@ -0,0 +1,8 @@
+"""
+Profiling web components
+
+Admin-only control page for the on-demand profiler:
+- ProfilingForm choosing stack sampling, allocation tracking and which requests
+- Start, stop and clear actions shared with every worker process
+- Downloads of the collapsed-stack and allocation reports per view
+"""
@@ -0,0 +1,86 @@
+"""
+Profiling forms
+"""
+import time
+
+from django import forms
+from django.urls import URLPattern, URLResolver, get_resolver
+from project.profiling.control import ProfilingControl
+
+
+def url_names(patterns=None, namespace=''):
+    """Every namespaced URL name in the project, e.g. 'sample:person_list'"""
+    names = set()
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            names |= url_names(pattern.url_patterns, prefix)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(namespace + pattern.name)
+    return names
+
+
+class ProfilingForm(forms.Form):
+    """What to profile on the next requests, and for how long"""
+    cpu = forms.BooleanField(
+        required=False,
+        label='Sample stacks',
+        help_text='Collapsed stacks for flamegraphs, written to <view>.collapsed.',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+    memory = forms.BooleanField(
+        required=False,
+        label='Track allocations',
+        help_text='tracemalloc diff per request, written to <view>.allocations.txt. Slows profiled requests noticeably.',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+    fraction = forms.FloatField(
+        min_value=0.0001,
+        max_value=1.0,
+        initial=0.1,
+        help_text='Share of matching requests to profile, from 0.0001 to 1.',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': 'any'}),
+    )
+    url_name = forms.CharField(
+        required=False,
+        label='URL name',
+        help_text='Only profile this view, e.g. sample:person_list. Leave empty for all views.',
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+    )
+    interval_ms = forms.IntegerField(
+        min_value=1,
+        max_value=1000,
+        initial=5,
+        label='Sampling interval (ms)',
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+    minutes = forms.IntegerField(
+        min_value=1,
+        max_value=240,
+        initial=10,
+        help_text='Profiling switches itself off after this many minutes.',
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+
+    def clean_url_name(self):
+        url_name = self.cleaned_data['url_name'].strip()
+        if url_name and url_name not in url_names():
+            raise forms.ValidationError(f'There is no URL named "{url_name}".')
+        return url_name
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('cpu') and not cleaned_data.get('memory'):
+            raise forms.ValidationError('Choose stack sampling, allocation tracking or both.')
+        return cleaned_data
+
+    def to_control(self):
+        data = self.cleaned_data
+        return ProfilingControl(
+            cpu=data['cpu'],
+            memory=data['memory'],
+            fraction=data['fraction'],
+            url_name=data['url_name'],
+            interval_ms=data['interval_ms'],
+            expires_at=time.time() + data['minutes'] * 60,
+        )
@@ -0,0 +1,12 @@
+"""
+Profiling URLs
+"""
+from django.urls import path
+from . import views
+
+app_name = 'profiling'
+
+urlpatterns = [
+    path('', views.control_panel, name='control'),
+    path('reports/<str:name>', views.report, name='report'),
+]
@@ -0,0 +1,62 @@
+"""
+Profiling views
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib import messages
+from django.contrib.auth.decorators import user_passes_test
+from django.http import FileResponse, Http404
+from django.shortcuts import redirect, render
+from project.profiling import control
+from project.profiling.capture import reports
+from .forms import ProfilingForm
+
+superuser_required = user_passes_test(
+    lambda user: user.is_active and user.is_superuser, login_url='admin:login'
+)
+
+
+@superuser_required
+def control_panel(request):
+    """Start, stop or clear on-demand profiling for every worker process"""
+    if request.method == 'POST' and 'stop' in request.POST:
+        control.save(control.ProfilingControl())
+        messages.success(request, 'Profiling stopped.')
+        return redirect('profiling:control')
+    if request.method == 'POST' and 'clear' in request.POST:
+        for name, _, _ in reports():
+            (control.directory() / name).unlink(missing_ok=True)
+        messages.success(request, 'Reports deleted.')
+        return redirect('profiling:control')
+
+    if request.method == 'POST':
+        form = ProfilingForm(request.POST)
+        if form.is_valid():
+            control.save(form.to_control())
+            messages.success(request, 'Profiling started.')
+            return redirect('profiling:control')
+    else:
+        form = ProfilingForm()
+
+    current = control.current()
+    return render(request, 'profiling/control.html', {
+        'form': form,
+        'current': current if current.active else None,
+        'expires_at': datetime.fromtimestamp(current.expires_at, dt_timezone.utc),
+        'reports': [
+            {'name': name, 'size': size, 'modified': datetime.fromtimestamp(mtime, dt_timezone.utc)}
+            for name, size, mtime in reports()
+        ],
+    })
+
+
+@superuser_required
+def report(request, name):
+    """Download one collapsed-stack or allocation report"""
+    if name not in {report_name for report_name, _, _ in reports()}:
+        raise Http404('No such report.')
+    return FileResponse(
+        open(control.directory() / name, 'rb'),
+        content_type='text/plain; charset=utf-8',
+        filename=name,
+    )
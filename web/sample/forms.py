@@ -30,8 +30,8 @@ class PersonForm(forms.ModelForm):
         """Validate email uniqueness"""
         email = self.cleaned_data.get('email')
         if email:
-            # Check if email exists, excluding current instance if updating
-            queryset = Person.objects.filter(email=email)
+            # Check if email exists in any letter case, excluding current instance if updating
+            queryset = Person.objects.with_email(email)
             if self.instance.pk:
                 queryset = queryset.exclude(pk=self.instance.pk)
             
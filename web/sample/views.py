@@ -3,20 +3,40 @@ Sample app views
 """
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
+from django.http import Http404
 from django.urls import reverse
-from project.sample.models import Person
+from project.sample.cache import person_cache
+from project.sample.models import ArchivedPerson, Person
+from project.sharding.shards import merge_ordered
 from .forms import PersonForm
 
 
+def get_person_or_404(pk):
+    """Look a person up through the Person cache"""
+    try:
+        return person_cache.get(pk)
+    except Person.DoesNotExist:
+        raise Http404("No Person matches the given query.")
+
+
 def person_list(request):
-    """List all people"""
+    """List all people, optionally narrowed by a name prefix or email"""
     people = Person.objects.all()
-    return render(request, 'sample/person_list.html', {'people': people})
+    query = request.GET.get('q', '').strip()
+    if query:
+        people = people.search(query)
+    return render(request, 'sample/person_list.html', {
+        'people': merge_ordered(people),
+        'query': query,
+    })
 
 
 def person_detail(request, pk):
-    """Display a single person's details"""
-    person = get_object_or_404(Person, pk=pk)
+    """Display a single person's details, reading through to the archive"""
+    try:
+        person = person_cache.get(pk)
+    except Person.DoesNotExist:
+        person = get_object_or_404(ArchivedPerson.objects.for_pk(pk), pk=pk)
     return render(request, 'sample/person_detail.html', {'person': person})
 
 
@@ -36,7 +56,7 @@ def person_create(request):
 
 def person_update(request, pk):
     """Update an existing person"""
-    person = get_object_or_404(Person, pk=pk)
+    person = get_person_or_404(pk)
     
     if request.method == 'POST':
         form = PersonForm(request.POST, instance=person)
@@ -52,7 +72,7 @@ def person_update(request, pk):
 
 def person_delete(request, pk):
     """Delete a person"""
-    person = get_object_or_404(Person, pk=pk)
+    person = get_person_or_404(pk)
     
     if request.method == 'POST':
         name = person.full_name
@@ -0,0 +1,41 @@
+"""
+Jinja2 environment for the web/ templates
+
+Mirrors the Django template helpers the pages rely on: ``url()``,
+``static()``, the ``date`` filter, ``messages`` (via the context processor)
+and ``csrf_input``/``csrf_token`` (provided by Django's Jinja2 backend).
+Compiled templates are cached as bytecode on disk so new worker processes
+skip the parse and compile step.
+"""
+import os
+
+from django.conf import settings
+from django.template.defaultfilters import date as date_filter
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.timezone import template_localtime
+from jinja2 import Environment, FileSystemBytecodeCache
+
+
+def url(viewname, *args, **kwargs):
+    """Equivalent of the ``{% url %}`` tag"""
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def date(value, arg=None):
+    """Equivalent of the ``date`` filter, including the conversion to local time"""
+    return date_filter(template_localtime(value), arg)
+
+
+def environment(**options):
+    cache_dir = getattr(settings, 'JINJA2_BYTECODE_CACHE_DIR', None)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        options.setdefault('bytecode_cache', FileSystemBytecodeCache(str(cache_dir)))
+    env = Environment(**options)
+    env.globals.update({
+        'url': url,
+        'static': static,
+    })
+    env.filters['date'] = date
+    return env